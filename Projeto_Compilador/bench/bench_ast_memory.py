@@ -0,0 +1,118 @@
+"""Bytes per AST node: slotted pascal_ast nodes versus the old nested tuples.
+
+    python bench/bench_ast_memory.py [--statements 100000]
+
+A generated program is parsed once. The same tree is then rebuilt in the
+tuple shape the parser produced before pascal_ast (bare ints and strings
+for literals, ('assign', name, exp), ...). Both trees are measured with
+sys.getsizeof over every object reachable from the root, each object
+counted once (names and string values are shared by both trees and
+counted in both).
+
+The nodes take less memory than the tuples: with the default program,
+45 bytes per node with their positions against 53, and 38 without them.
+A slotted node has no length field and no tag, so a statement or
+operator node is smaller than the tuple it replaces. The leaves are
+shared: the parser makes one Num, Real or Str per value and one Var per
+name, where the tuples had one ('var', name) per use. Only the
+declarations, the statements, Var and ArrayAccess carry a position.
+"""
+import argparse
+import sys
+import pasgen
+
+pasgen.use_src()
+import pascal_ast as ast  # noqa: E402
+from compiler import CompilerSession  # noqa: E402
+
+
+def as_tuples(node):
+    """The tree under node in the pre-pascal_ast tuple shape."""
+    t = as_tuples
+    if isinstance(node, ast.Program):
+        return ('program', node.name, t(node.block))
+    if isinstance(node, ast.Block):
+        declarations = ('var_decls', [t(d) for d in node.declarations]) if node.declarations else None
+        return ('code', declarations, t(node.body))
+    if isinstance(node, ast.VarDecl):
+        return ('decl', node.names, t(node.type))
+    if isinstance(node, ast.ArrayType):
+        return ('array', (node.low, node.high), t(node.elem))
+    if isinstance(node, ast.Assign):
+        return ('assign', node.name, t(node.exp))
+    if isinstance(node, ast.Write):
+        if node.newline and not node.args:
+            return 'writeln'
+        return ('writeln' if node.newline else 'write', [t(a) for a in node.args])
+    if isinstance(node, ast.ReadLn):
+        target = node.target
+        if isinstance(target, ast.ArrayAccess):
+            return ('readln_array', target.name, t(target.index))
+        return ('readln', target.name)
+    if isinstance(node, ast.If):
+        else_part = ('else', t(node.else_block)) if node.else_block is not None else None
+        return ('if', t(node.condition), ('then', t(node.then_block)), else_part)
+    if isinstance(node, ast.While):
+        return ('while', t(node.condition), t(node.body))
+    if isinstance(node, ast.For):
+        return ('for', node.var, t(node.start), t(node.stop), t(node.body))
+    if isinstance(node, ast.Compound):
+        return ('compound', [t(s) for s in node.statements])
+    if isinstance(node, (ast.Num, ast.Real, ast.Str)):
+        return node.value
+    if isinstance(node, ast.Var):
+        return ('var', node.name)
+    if isinstance(node, ast.ArrayAccess):
+        return ('array_access', node.name, t(node.index))
+    if isinstance(node, ast.BinOp):
+        return (node.op, t(node.left), t(node.right))
+    if isinstance(node, ast.Compare):
+        return ('rel', node.op, t(node.left), t(node.right))
+    if isinstance(node, ast.UnaryOp):
+        return ('uminus' if node.op == '-' else 'not', t(node.operand))
+    if isinstance(node, ast.Formatted):
+        fmt = node.width if node.decimals is None else (node.width, node.decimals)
+        return ('formatted', t(node.exp), fmt)
+    return node
+
+
+def deep_size(root, positions=True):
+    """Total sys.getsizeof of the objects reachable from root, each once."""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (tuple, list)):
+            stack.extend(obj)
+        elif isinstance(obj, ast.Node):
+            stack.extend(getattr(obj, name) for name in type(obj).__slots__
+                         if positions or name != 'lexpos')
+    return total
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--statements", type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    tree = CompilerSession(lexer_backend='fast').parse(pasgen.program(args.statements))
+    nodes = sum(1 for _ in ast.walk(tree))
+    node_bytes = deep_size(tree)
+    bare_bytes = deep_size(tree, positions=False)
+    tuple_bytes = deep_size(as_tuples(tree))
+
+    print(f"{args.statements} statements, {nodes} AST nodes")
+    print(f"tuples  {tuple_bytes / 1024 / 1024:8.1f} MiB  {tuple_bytes / nodes:6.1f} bytes/node")
+    print(f"nodes   {bare_bytes / 1024 / 1024:8.1f} MiB  {bare_bytes / nodes:6.1f} bytes/node"
+          f"  (without the position ints)")
+    print(f"nodes   {node_bytes / 1024 / 1024:8.1f} MiB  {node_bytes / nodes:6.1f} bytes/node"
+          f"  (with source positions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Instructions executed with short-circuit conditions versus full evaluation.
+
+    python bench/bench_conditions.py [files...]
+
+Each program (by default tests/NestedIf.pas, tests/BooleanTest.pas and
+CONDITIONS, a loop full of and/or/not conditions) is translated twice, with
+the conditions of if and while evaluated in full and then with jumps, and
+run in the simulator of bench/ewvm.py, reading INPUT. Both runs must
+print the same.
+"""
+import argparse
+import os
+import sys
+import ewvm
+import pasgen
+
+pasgen.use_src()
+from compiler import CompilerSession  # noqa: E402
+from translator import Translator  # noqa: E402
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+INPUT = [str(k % 7) for k in range(1, 101)]
+
+CONDITIONS = """program Conditions;
+var
+    i, j, n, hits: integer;
+    v: array[1..100] of integer;
+begin
+    n := 50;
+    for i := 1 to 100 do
+        readln(v[i]);
+    for i := 1 to 100 do
+    begin
+        if (i <= n) and (v[i] > 3) then
+            hits := hits + 1;
+        if (i > 90) or (v[i] = 0) or (i % 2 = 0) then
+            hits := hits + 2;
+        if not ((i < 10) and (v[i] < 2)) then
+            hits := hits - 1
+        else
+            hits := hits + 3;
+    end;
+    j := 0;
+    while (j < n) and (v[j + 1] >= 0) do
+        j := j + 1;
+    writeln(hits, ' ', j);
+end.
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*",
+                            help="programs (default: NestedIf.pas, BooleanTest.pas and CONDITIONS)")
+    args = arg_parser.parse_args()
+
+    if args.files:
+        programs = [(os.path.basename(path), open(path, encoding="utf-8").read()) for path in args.files]
+    else:
+        programs = [(name, open(os.path.join(TESTS, name), encoding="utf-8").read())
+                    for name in ("NestedIf.pas", "BooleanTest.pas")]
+        programs.append(("(conditions)", CONDITIONS))
+
+    session = CompilerSession()
+    print(f"{'program':20} {'full':>8} {'jumps':>8} {'saved':>8}")
+    for name, source in programs:
+        tree = session.parse(source)
+        steps = []
+        outputs = set()
+        for short_circuit in (False, True):
+            result = ewvm.run(Translator(short_circuit=short_circuit).translate_program(tree), INPUT)
+            steps.append(result.steps)
+            outputs.add(result.output)
+        if len(outputs) != 1:
+            sys.exit(f"{name}: the two translations print different results")
+        full, jumps = steps
+        print(f"{name:20} {full:8d} {jumps:8d} {full - jumps:8d}")
+
+
+if __name__ == "__main__":
+    main()
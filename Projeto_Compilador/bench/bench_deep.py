@@ -0,0 +1,99 @@
+"""Compile time of very deep trees: long expressions and deeply nested blocks and loops.
+
+    python bench/bench_deep.py [--terms 100000] [--depth 10000] [--max-seconds 30]
+
+Four programs are generated: one with a single assignment of --terms terms
+(i + j + v[k] + 2 + i + ..., a left-leaning tree --terms levels deep, inside
+a for loop so the loop passes see it too), one with --depth nested
+if ... then begin ... end blocks, one with --depth nested while loops and
+one with --depth nested for loops (each with its own counter). Each is
+compiled at every -O level and with --check-bounds. The compiler walks the
+trees with an explicit stack (src/trampoline.py), so none may hit Python's
+recursion limit, and the loop passes share one summary of each loop
+(semantic.analyze_loops), so deep loops must not cost time quadratic in
+their depth. The script fails if a compilation does not succeed or takes
+more than --max-seconds.
+"""
+import argparse
+import sys
+import time
+import pasgen
+
+pasgen.use_src()
+from compiler import OPT_LEVELS, CompilerSession  # noqa: E402
+
+HEADER = """program Deep;
+var
+    i, j, k, n, soma: integer;
+    v: array[1..10] of integer;
+begin
+"""
+
+
+def long_expression(terms):
+    operands = ("i", "j", "v[k]", "2")
+    exp = " + ".join(operands[t % len(operands)] for t in range(terms))
+    return HEADER + f"    for k := 1 to 10 do\n        soma := {exp};\n    writeln(soma)\nend.\n"
+
+
+def nested_blocks(depth):
+    opening = "    if i < n then begin\n" * depth
+    closing = "    end;\n" * (depth - 1) + "    end\n"
+    return HEADER + opening + "    soma := soma + 1\n" + closing + "end.\n"
+
+
+def nested_whiles(depth):
+    opening = "    while i < n do begin\n    i := i + 1;\n" * depth
+    closing = "    end;\n" * (depth - 1) + "    end\n"
+    return HEADER + opening + "    soma := soma + v[k]\n" + closing + "end.\n"
+
+
+def nested_fors(depth):
+    # Contadores não declarados: c1, c2, ... têm o seu slot no primeiro ciclo
+    opening = "".join(f"    for c{level} := 1 to n + {level % 7} do begin\n    soma := soma + c{level};\n"
+                      for level in range(1, depth + 1))
+    closing = "    end;\n" * (depth - 1) + "    end\n"
+    return HEADER + opening + "    soma := soma + v[k]\n" + closing + "end.\n"
+
+
+def compile_time(session, source):
+    start = time.perf_counter()
+    result = session.compile(source)
+    elapsed = time.perf_counter() - start
+    return elapsed, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--terms", type=int, default=100000, help="terms of the long expression")
+    arg_parser.add_argument("--depth", type=int, default=10000, help="nesting of the blocks and loops")
+    arg_parser.add_argument("--max-seconds", type=float, default=30.0,
+                            help="longest compilation allowed, in seconds")
+    args = arg_parser.parse_args()
+
+    programs = [
+        (f"{args.terms} terms", long_expression(args.terms)),
+        (f"{args.depth} nested ifs", nested_blocks(args.depth)),
+        (f"{args.depth} nested whiles", nested_whiles(args.depth)),
+        (f"{args.depth} nested fors", nested_fors(args.depth)),
+    ]
+    modes = [(f"-O{level}", {'opt_level': level}) for level in OPT_LEVELS]
+    modes.append(("--check-bounds", {'check_bounds': True}))
+    failed = False
+    print(f"{'program':20} {'mode':15} {'time':>8} {'instructions':>13}")
+    for name, source in programs:
+        for mode, options in modes:
+            seconds, result = compile_time(CompilerSession(lexer_backend='fast', **options), source)
+            if not result.success:
+                print(f"{name:20} {mode:15} failed: {result.errors}")
+                failed = True
+                continue
+            print(f"{name:20} {mode:15} {seconds:7.2f}s {len(result.vm_code):13d}")
+            if seconds > args.max_seconds:
+                print(f"{name:20} {mode:15} took more than {args.max_seconds:g}s")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Peak memory of lexing a large source read whole versus memory-mapped.
+
+    python bench/bench_input_memory.py [--mb 64]
+
+Each mode runs in its own process over the same generated file, which is
+lexed with the fast lexer (tokens are dropped as they come); the peak
+resident set size of the process is reported. Mapped pages count in it
+too, but they are page cache the kernel can drop, not copies of the text.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import pasgen
+
+CHILD = r"""
+import mmap, resource, sys
+sys.path.insert(0, sys.argv[1])
+import fast_lex
+mode, path = sys.argv[2], sys.argv[3]
+lexer = fast_lex.lexer.clone()
+lexer.lineno = 1
+if mode == 'read':
+    with open(path, 'r', encoding='utf-8') as f:
+        lexer.input(f.read())
+    count = sum(1 for _ in lexer)
+else:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        lexer.input(data)
+        count = sum(1 for _ in lexer)
+        lexer.input('')
+print(count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak(mode, path):
+    """(tokens, peak RSS in MiB) of lexing path in a fresh process."""
+    out = subprocess.run([sys.executable, "-c", CHILD, pasgen.SRC, mode, path],
+                         check=True, capture_output=True, text=True).stdout.split()
+    return int(out[0]), int(out[1]) / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--mb", type=float, default=64.0, help="size of the generated source")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.pas")
+        with open(path, "w", encoding="utf-8") as f:
+            # Sem o programa em memória: o pico do processo passa aos filhos
+            pasgen.write_program_of_size(f, int(args.mb * 1024 * 1024))
+        print(f"source: {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+        for mode in ("read", "mmap"):
+            count, rss = peak(mode, path)
+            print(f"{mode:5} {count:10d} tokens, peak RSS {rss:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
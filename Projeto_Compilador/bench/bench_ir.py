@@ -0,0 +1,59 @@
+"""Translation throughput and memory: ir.Code versus a list of text lines.
+
+    python bench/bench_ir.py [--statements 50000] [--runs 3]
+
+The AST of a generated program is translated into an ir.Code (what the
+passes work on) and, as the translator did before the IR, into the list of
+text lines (emit_program followed by render). Memory is what tracemalloc
+sees retained by the result.
+"""
+import argparse
+import time
+import tracemalloc
+import pasgen
+
+pasgen.use_src()
+from compiler import CompilerSession  # noqa: E402
+from translator import Translator  # noqa: E402
+
+
+def best_time(function, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def retained_bytes(function):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--statements", type=int, default=50000)
+    arg_parser.add_argument("--runs", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    tree = CompilerSession(lexer_backend='fast').parse(pasgen.program(args.statements))
+    count = Translator().emit_program(tree).instruction_count()
+    print(f"{args.statements} statements, {count} instructions")
+
+    for name, function in (("ir.Code", lambda: Translator().emit_program(tree)),
+                           ("lines", lambda: Translator().translate_program(tree))):
+        seconds = best_time(function, args.runs)
+        size = retained_bytes(function)
+        print(f"{name:8} {seconds:6.3f}s  {count / seconds:12,.0f} instructions/s  "
+              f"{size / 1024 / 1024:7.1f} MiB  {size / count:6.1f} bytes/instruction")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Tokens per second of the PLY lexer versus the single-regex lexer.
+
+    python bench/bench_lexer.py [--mb 4] [--runs 3]
+
+Both lexers run over the same generated source; the token streams
+(type, value, lineno, lexpos) are also compared.
+"""
+import argparse
+import time
+import pasgen
+
+pasgen.use_src()
+import fast_lex  # noqa: E402
+import pascal_lex  # noqa: E402
+
+
+def start(base_lexer, data):
+    lexer = base_lexer.clone()
+    lexer.lineno = 1
+    lexer.input(data)
+    return lexer
+
+
+def count_tokens(base_lexer, data):
+    # Tokens are dropped as they come, like the parser does
+    token = start(base_lexer, data).token
+    count = 0
+    while token() is not None:
+        count += 1
+    return count
+
+
+def best_time(base_lexer, data, runs):
+    best = None
+    for _ in range(runs):
+        begin = time.perf_counter()
+        count = count_tokens(base_lexer, data)
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def same_stream(data):
+    ply_lexer = start(pascal_lex.lexer, data)
+    fast_lexer = start(fast_lex.lexer, data)
+    while True:
+        a = ply_lexer.token()
+        b = fast_lexer.token()
+        if a is None or b is None:
+            return a is None and b is None
+        if (a.type, a.value, a.lineno, a.lexpos) != (b.type, b.value, b.lineno, b.lexpos):
+            return False
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--mb", type=float, default=4.0, help="size of the generated source")
+    arg_parser.add_argument("--runs", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    data = pasgen.program_of_size(int(args.mb * 1024 * 1024))
+    print(f"source: {len(data) / 1024 / 1024:.1f} MiB")
+
+    results = {}
+    for name, base_lexer in (("ply", pascal_lex.lexer), ("fast", fast_lex.lexer)):
+        seconds, count = best_time(base_lexer, data, args.runs)
+        results[name] = seconds
+        print(f"{name:5} {count:9d} tokens in {seconds:6.2f}s  -> {count / seconds:12,.0f} tokens/s")
+
+    print(f"speedup: {results['ply'] / results['fast']:.2f}x, "
+          f"same token stream: {same_stream(data)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Instructions executed with the loop test at the top versus at the bottom.
+
+    python bench/bench_loops.py [--input 10] [files...]
+
+Each program (by default tests/while.pas and tests/Fatorial.pas) is
+translated with the usual loop layout (test at the top, JUMP back at the
+bottom) and rotated (test at the entry and again at the bottom, with a
+conditional jump back), and run in the simulator of bench/ewvm.py; every
+readln reads --input. Both runs must print the same.
+"""
+import argparse
+import os
+import sys
+import ewvm
+import pasgen
+
+pasgen.use_src()
+from compiler import CompilerSession  # noqa: E402
+from translator import Translator  # noqa: E402
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*", help="programs (default: while.pas and Fatorial.pas)")
+    arg_parser.add_argument("--input", default="10", help="value read by every readln")
+    args = arg_parser.parse_args()
+
+    files = args.files or [os.path.join(TESTS, name) for name in ("while.pas", "Fatorial.pas")]
+    session = CompilerSession()
+    print(f"{'program':20} {'top':>8} {'rotated':>8} {'saved':>8} {'size':>11}")
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = session.parse(f.read())
+        steps = []
+        sizes = []
+        outputs = set()
+        for rotate_loops in (False, True):
+            code = Translator(rotate_loops=rotate_loops).emit_program(tree)
+            result = ewvm.run(code.render(), [args.input] * 100)
+            steps.append(result.steps)
+            sizes.append(code.instruction_count())
+            outputs.add(result.output)
+        if len(outputs) != 1:
+            sys.exit(f"{path}: the two translations print different results")
+        top, rotated = steps
+        print(f"{os.path.basename(path):20} {top:8d} {rotated:8d} {top - rotated:8d} "
+              f"{sizes[0]:5d}->{sizes[1]:<5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Parse time against the number of statements in one block.
+
+    python bench/bench_parse_scaling.py [--sizes 1000 10000 100000 1000000] [--max-ratio 2.0]
+
+Each size is a generated program with that many statements in its main
+block (a million statements take a couple of minutes with PLY). The time
+per statement should stay flat; the script fails when the largest size
+costs more than --max-ratio times the smallest per statement.
+"""
+import argparse
+import sys
+import time
+import pasgen
+
+pasgen.use_src()
+from compiler import CompilerSession  # noqa: E402
+
+
+def parse_time(session, statements):
+    source = pasgen.program(statements)
+    start = time.perf_counter()
+    ast = session.parse(source)
+    elapsed = time.perf_counter() - start
+    if ast is None:
+        raise SystemExit(f"{statements} statements: parse failed")
+    return elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    arg_parser.add_argument("--max-ratio", type=float, default=2.0,
+                            help="largest allowed growth of the time per statement")
+    arg_parser.add_argument("--lexer", choices=("ply", "fast"), default="fast")
+    args = arg_parser.parse_args()
+
+    session = CompilerSession(lexer_backend=args.lexer)
+    per_statement = []
+    for statements in sorted(args.sizes):
+        seconds = parse_time(session, statements)
+        per_statement.append(seconds / statements)
+        print(f"{statements:9d} statements  {seconds:8.2f}s  {per_statement[-1] * 1e6:7.2f} us/statement")
+
+    ratio = per_statement[-1] / per_statement[0]
+    print(f"time per statement, largest / smallest: {ratio:.2f} (limit {args.max_ratio})")
+    sys.exit(0 if ratio <= args.max_ratio else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Cold-start time of `import pascal_sin`.
+
+Each sample runs a fresh interpreter (from an unrelated working directory)
+that imports the front end and reports how long the import took. The first
+run uses an empty table cache, the others reuse the tables it wrote.
+
+    python bench/bench_startup.py [--runs 20] [--budget-ms 100]
+
+Exits with status 1 when the median warm import exceeds the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+PROBE = (
+    "import sys, time\n"
+    "sys.path.insert(0, {src!r})\n"
+    "t = time.perf_counter()\n"
+    "import pascal_sin\n"
+    "print(time.perf_counter() - t)\n"
+)
+
+
+def import_time(cache_dir):
+    env = dict(os.environ, PASCAL_CACHE_DIR=cache_dir)
+    out = subprocess.run([sys.executable, "-c", PROBE.format(src=os.path.abspath(SRC))],
+                         env=env, cwd=tempfile.gettempdir(), check=True,
+                         capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1]) * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--runs", type=int, default=20)
+    arg_parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = import_time(cache_dir)
+        warm = [import_time(cache_dir) for _ in range(args.runs)]
+
+    median = statistics.median(warm)
+    print(f"cold (empty cache): {cold:7.1f} ms")
+    print(f"warm median:        {median:7.1f} ms  (min {min(warm):.1f}, max {max(warm):.1f}, {args.runs} runs)")
+    print(f"budget:             {args.budget_ms:7.1f} ms  -> {'OK' if median <= args.budget_ms else 'OVER BUDGET'}")
+    return 0 if median <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
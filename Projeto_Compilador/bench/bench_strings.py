@@ -0,0 +1,63 @@
+"""Size of the generated code and strings made at run time, with and without the string pool.
+
+    python bench/bench_strings.py [--statements 2000] [--input 3] [files...]
+
+Each program (by default tests/Varios_prints.pas, tests/String.pas and a
+generated program of --statements statements, whose messages repeat) is
+compiled as usual and with --string-pool, and run in the simulator of
+bench/ewvm.py (every readln reads --input). For each one the bytes of the
+VM code, its instructions and the strings made by PUSHS while running are
+printed. Both runs must print the same.
+"""
+import argparse
+import os
+import sys
+import ewvm
+import pasgen
+
+pasgen.use_src()
+from compiler import CompilerSession  # noqa: E402
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+
+def measure(session, source, inputs):
+    """(bytes, instructions, strings made, output, pooled literals) of a compilation."""
+    result = session.compile(source)
+    if not result.success:
+        sys.exit(f"compilation failed: {result.errors}")
+    run = ewvm.run(result.vm_code, inputs)
+    size = len("\n".join(result.vm_code).encode("utf-8"))
+    return size, len(result.vm_code), run.strings, run.output, result.stats.get('strings.pooled', 0)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*", help="programs (default: Varios_prints.pas, String.pas "
+                                                     "and a generated one)")
+    arg_parser.add_argument("--statements", type=int, default=2000, help="size of the generated program")
+    arg_parser.add_argument("--input", default="3", help="value read by every readln")
+    args = arg_parser.parse_args()
+
+    programs = []
+    for path in args.files or [os.path.join(TESTS, name) for name in ("Varios_prints.pas", "String.pas")]:
+        with open(path, "r", encoding="utf-8") as f:
+            programs.append((os.path.basename(path), f.read()))
+    if not args.files:
+        programs.append((f"generated {args.statements}", pasgen.program(args.statements)))
+
+    plain = CompilerSession()
+    pooled = CompilerSession(string_pool=True)
+    inputs = [args.input] * 1000
+    print(f"{'program':20} {'pooled':>6} {'bytes':>15} {'instructions':>13} {'strings':>13}")
+    for name, source in programs:
+        before = measure(plain, source, inputs)
+        after = measure(pooled, source, inputs)
+        if before[3] != after[3]:
+            sys.exit(f"{name}: the two compilations print different results")
+        print(f"{name:20} {after[4]:6d} {before[0]:7d}->{after[0]:<7d} {before[1]:6d}->{after[1]:<6d} "
+              f"{before[2]:6d}->{after[2]:<6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Translation speed in AST nodes per second.
+
+    python bench/bench_translate.py [--statements 50000] [--runs 5] [-O 0]
+
+The AST of a generated program (bench/pasgen.py) is translated to an
+ir.Code --runs times with the translator of the given -O level (including
+the type annotation it starts with); the best time is reported as nodes
+of the tree translated per second.
+"""
+import argparse
+import time
+import pasgen
+
+pasgen.use_src()
+from compiler import OPT_LEVELS, CompilerSession  # noqa: E402
+from pascal_ast import walk  # noqa: E402
+from translator import Translator  # noqa: E402
+
+
+def best_time(function, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--statements", type=int, default=50000)
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=0)
+    args = arg_parser.parse_args()
+
+    tree = CompilerSession(lexer_backend='fast').parse(pasgen.program(args.statements))
+    nodes = sum(1 for _ in walk(tree))
+    options = {'rotate_loops': args.opt_level >= 1}
+    seconds = best_time(lambda: Translator(**options).emit_program(tree), args.runs)
+    print(f"{args.statements} statements, {nodes} nodes")
+    print(f"{seconds:6.3f}s  {nodes / seconds:12,.0f} nodes/s  {seconds / nodes * 1e6:6.2f} us/node")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Write calls executed with and without merging constant write arguments.
+
+    python bench/bench_writes.py [--lines 200] [--input 3] [files...]
+
+Each program (by default tests/*.pas and a generated report of --lines
+lines made of literal text and constant numbers) is parsed, its constants
+folded, and translated as it is and after optimizer.merge_writes; both are
+run in the simulator of bench/ewvm.py (every readln reads --input). For
+each one the write instructions (WRITEI/WRITEF/WRITES/WRITELN) executed,
+and all the instructions executed, are printed. Both runs must print the
+same.
+"""
+import argparse
+import glob
+import os
+import sys
+import ewvm
+import pasgen
+
+pasgen.use_src()
+from compiler import CompilerSession  # noqa: E402
+from optimizer import fold_constants, merge_writes  # noqa: E402
+from translator import Translator  # noqa: E402
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+
+def report(lines):
+    """A program printing a report of literal text, constant numbers and a few variables."""
+    body = []
+    for n in range(lines):
+        body.append(f"    write('Linha ', {n + 1}, ': ');\n")
+        body.append(f"    writeln('total = ', {n} * 10 + 5, ' unidades, media ', soma, ' por ', 'dia');\n")
+    return ("program Relatorio;\nvar\n    soma: integer;\nbegin\n    soma := 7;\n"
+            + "".join(body) + "    writeln('fim')\nend.\n")
+
+
+def run(session, source, merge, inputs):
+    tree = session.parse(source)
+    if tree is None:
+        sys.exit(f"parse failed: {session.parser.syntax_errors + session.semantic_errors}")
+    fold_constants(tree)
+    if merge:
+        merge_writes(tree)
+    return ewvm.run(Translator().emit_program(tree).render(), inputs)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*", help="programs (default: tests/*.pas and a generated report)")
+    arg_parser.add_argument("--lines", type=int, default=200, help="lines of the generated report")
+    arg_parser.add_argument("--input", default="3", help="value read by every readln")
+    args = arg_parser.parse_args()
+
+    programs = []
+    for path in args.files or sorted(glob.glob(os.path.join(TESTS, "*.pas"))):
+        with open(path, "r", encoding="utf-8") as f:
+            programs.append((os.path.basename(path), f.read()))
+    if not args.files:
+        programs.append((f"report {args.lines}", report(args.lines)))
+
+    session = CompilerSession()
+    inputs = [args.input] * 1000
+    total = [0, 0, 0, 0]
+    print(f"{'program':20} {'writes':>15} {'executed':>17}")
+    for name, source in programs:
+        before = run(session, source, False, inputs)
+        after = run(session, source, True, inputs)
+        if before.output != after.output:
+            sys.exit(f"{name}: the two translations print different results")
+        print(f"{name:20} {before.writes:7d}->{after.writes:<7d} {before.steps:8d}->{after.steps:<8d}")
+        for i, count in enumerate((before.writes, after.writes, before.steps, after.steps)):
+            total[i] += count
+    print(f"{'total':20} {total[0]:7d}->{total[1]:<7d} {total[2]:8d}->{total[3]:<8d}")
+
+
+if __name__ == "__main__":
+    main()
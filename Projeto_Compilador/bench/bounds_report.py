@@ -0,0 +1,61 @@
+"""Runtime bound checks left and removed by the range analysis, per program.
+
+    python bench/bounds_report.py [-O 0] [--input 3] [files...]
+
+Every program (by default tests/*.pas) is compiled with --check-bounds.
+For each one the number of CHECK instructions emitted, the array accesses
+the range analysis (src/ranges.py) proved in bounds and the instructions
+executed with and without the checks in the simulator of bench/ewvm.py
+(every readln reads --input) are printed.
+"""
+import argparse
+import glob
+import os
+import ewvm
+import pasgen
+
+pasgen.use_src()
+from compiler import OPT_LEVELS, CompilerSession  # noqa: E402
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+
+def executed(vm_code, inputs):
+    """Instructions executed, or the error that stopped the program."""
+    try:
+        return str(ewvm.run(vm_code, inputs).steps)
+    except ewvm.VMError as e:
+        return f"error: {e}"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*", help="programs (default: tests/*.pas)")
+    arg_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=0)
+    arg_parser.add_argument("--input", default="3", help="value read by every readln")
+    args = arg_parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(TESTS, "*.pas")))
+    plain = CompilerSession(opt_level=args.opt_level)
+    checked = CompilerSession(opt_level=args.opt_level, check_bounds=True)
+    total_checks = total_elided = 0
+    print(f"{'program':20} {'checks':>7} {'elided':>7}  {'run':>8} {'checked':>8}")
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        before = plain.compile(source)
+        after = checked.compile(source)
+        if not (before.success and after.success):
+            print(f"{os.path.basename(path):20} failed: {before.errors or after.errors}")
+            continue
+        checks, elided = after.stats['bounds.checks'], after.stats['bounds.elided']
+        total_checks += checks
+        total_elided += elided
+        inputs = [args.input] * 1000
+        print(f"{os.path.basename(path):20} {checks:7d} {elided:7d}  "
+              f"{executed(before.vm_code, inputs):>8} {executed(after.vm_code, inputs):>8}")
+    print(f"{'total':20} {total_checks:7d} {total_elided:7d}")
+
+
+if __name__ == "__main__":
+    main()
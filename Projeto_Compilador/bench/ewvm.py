@@ -0,0 +1,166 @@
+"""A small simulator of the EWVM instructions the compiler emits.
+
+    python bench/ewvm.py program.txt [input ...]
+
+It runs the text of Output.txt and counts the instructions executed (and
+the strings made by PUSHS and the write calls), so the benchmarks can
+compare the code of two compilations on the same input.
+Global variables live at the bottom of the operand stack (PUSHG n reads
+slot n), heap blocks are Python lists and an address is a (block, offset)
+pair. READ takes the next of the given inputs ('0' when they run out).
+"""
+import sys
+
+
+class VMError(Exception):
+    pass
+
+
+def _div(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return int(a / b)
+    return a / b
+
+
+_BINARY = {
+    'ADD': lambda a, b: a + b,
+    'SUB': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'DIV': _div,
+    'MOD': lambda a, b: a - b * int(a / b),
+    'EQUAL': lambda a, b: int(a == b),
+    'INF': lambda a, b: int(a < b),
+    'INFEQ': lambda a, b: int(a <= b),
+    'SUP': lambda a, b: int(a > b),
+    'SUPEQ': lambda a, b: int(a >= b),
+    'AND': lambda a, b: int(bool(a) and bool(b)),
+    'OR': lambda a, b: int(bool(a) or bool(b)),
+}
+
+
+def assemble(lines):
+    """(instructions, labels) of the text of a program: [(name, operand)], {label: index}."""
+    instrs = []
+    labels = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.endswith(':'):
+            labels[line[:-1]] = len(instrs)
+            continue
+        name, _, operand = line.partition(' ')
+        instrs.append((name, operand or None))
+    return instrs, labels
+
+
+class Result:
+    __slots__ = ('output', 'steps', 'strings', 'writes')
+
+    def __init__(self, output, steps, strings=0, writes=0):
+        self.output = output
+        self.steps = steps
+        self.strings = strings
+        self.writes = writes
+
+
+def run(lines, inputs=(), limit=10 ** 7):
+    """Execute a program (lines of VM code); returns a Result."""
+    instrs, labels = assemble(lines)
+    stack = []
+    heap = []
+    output = []
+    inputs = list(inputs)
+    pc = steps = strings = writes = 0
+    while pc < len(instrs):
+        steps += 1
+        if steps > limit:
+            raise VMError(f"more than {limit} instructions executed")
+        name, arg = instrs[pc]
+        pc += 1
+        if name in _BINARY:
+            b = stack.pop()
+            stack.append(_BINARY[name](stack.pop(), b))
+        elif name == 'PUSHI':
+            stack.append(int(arg))
+        elif name == 'PUSHF':
+            stack.append(float(arg))
+        elif name == 'PUSHS':
+            strings += 1
+            stack.append(arg[1:-1])
+        elif name == 'PUSHG':
+            stack.append(stack[int(arg)])
+        elif name == 'STOREG':
+            stack[int(arg)] = stack.pop()
+        elif name == 'DUP':
+            stack.extend(stack[-int(arg):])
+        elif name == 'POP':
+            del stack[-int(arg):]
+        elif name == 'SWAP':
+            stack[-1], stack[-2] = stack[-2], stack[-1]
+        elif name == 'ALLOCN':
+            heap.append([0] * stack.pop())
+            stack.append((len(heap) - 1, 0))
+        elif name == 'PADD':
+            offset = stack.pop()
+            block, base = stack.pop()
+            stack.append((block, base + offset))
+        elif name in ('LOADN', 'LOAD'):
+            offset = stack.pop() if name == 'LOADN' else int(arg)
+            block, base = stack.pop()
+            stack.append(_cell(heap, block, base + offset))
+        elif name in ('STOREN', 'STORE'):
+            value = stack.pop()
+            offset = stack.pop() if name == 'STOREN' else int(arg)
+            block, base = stack.pop()
+            _cell(heap, block, base + offset)
+            heap[block][base + offset] = value
+        elif name == 'CHECK':
+            low, high = (int(n) for n in arg.split(','))
+            if not low <= stack[-1] <= high:
+                raise VMError(f"CHECK {arg}: {stack[-1]} out of range")
+        elif name == 'READ':
+            stack.append(inputs.pop(0) if inputs else '0')
+        elif name == 'ATOI':
+            stack.append(int(stack.pop()))
+        elif name == 'ATOF':
+            stack.append(float(stack.pop()))
+        elif name in ('WRITEI', 'WRITEF', 'WRITES'):
+            writes += 1
+            output.append(str(stack.pop()))
+        elif name == 'WRITELN':
+            writes += 1
+            output.append('\n')
+        elif name == 'NOT':
+            stack.append(int(stack.pop() == 0))
+        elif name == 'JZ':
+            if stack.pop() == 0:
+                pc = labels[arg]
+        elif name == 'JUMP':
+            pc = labels[arg]
+        elif name == 'START':
+            pass
+        elif name == 'STOP':
+            break
+        else:
+            raise VMError(f"unknown instruction {name}")
+    return Result(''.join(output), steps, strings, writes)
+
+
+def _cell(heap, block, index):
+    if not 0 <= index < len(heap[block]):
+        raise VMError(f"index {index} outside a block of {len(heap[block])}")
+    return heap[block][index]
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("usage: python bench/ewvm.py program.txt [input ...]")
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        result = run(f.read().splitlines(), sys.argv[2:])
+    sys.stdout.write(result.output)
+    print(f"\n[{result.steps} instructions executed]", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Instructions saved by each optimization level on the programs in tests/.
+
+    python bench/opt_report.py [-O 1] [files...]
+
+For every program the number of VM instructions (labels not counted) at
+-O0 and at the chosen level is printed, with the number of instructions
+executed by each in the simulator of bench/ewvm.py (every readln reads
+--input) and the counters of the passes. Loop transformations trade code
+size for fewer executed instructions.
+"""
+import argparse
+import glob
+import os
+import ewvm
+import pasgen
+
+pasgen.use_src()
+from compiler import OPT_LEVELS, CompilerSession  # noqa: E402
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+
+def instruction_count(vm_code):
+    return sum(1 for line in vm_code if not line.endswith(':'))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*", help="programs (default: tests/*.pas)")
+    arg_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=max(OPT_LEVELS))
+    arg_parser.add_argument("--input", default="10", help="value read by every readln")
+    args = arg_parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(TESTS, "*.pas")))
+    plain = CompilerSession()
+    optimized = CompilerSession(opt_level=args.opt_level)
+    total_before = total_after = run_before = run_after = 0
+    level = '-O' + str(args.opt_level)
+    print(f"{'program':20} {'-O0':>6} {level:>6} {'saved':>6}  {'run -O0':>8} {'run ' + level:>8}  passes")
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        before = plain.compile(source)
+        after = optimized.compile(source)
+        if not (before.success and after.success):
+            print(f"{os.path.basename(path):20} failed: {before.errors or after.errors}")
+            continue
+        n_before = instruction_count(before.vm_code)
+        n_after = instruction_count(after.vm_code)
+        steps_before = ewvm.run(before.vm_code, [args.input] * 100).steps
+        steps_after = ewvm.run(after.vm_code, [args.input] * 100).steps
+        total_before += n_before
+        total_after += n_after
+        run_before += steps_before
+        run_after += steps_after
+        counters = ", ".join(f"{name}={count}" for name, count in after.stats.items() if count)
+        print(f"{os.path.basename(path):20} {n_before:6d} {n_after:6d} {n_before - n_after:6d}  "
+              f"{steps_before:8d} {steps_after:8d}  {counters}")
+    print(f"{'total':20} {total_before:6d} {total_after:6d} {total_before - total_after:6d}  "
+          f"{run_before:8d} {run_after:8d}")
+
+
+if __name__ == "__main__":
+    main()
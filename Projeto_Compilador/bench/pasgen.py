@@ -0,0 +1,81 @@
+"""Generators of large Pascal programs for the benchmarks."""
+import os
+import random
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def use_src():
+    """Make the compiler modules importable from the benchmarks."""
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+
+
+HEADER = """program Generated;
+var
+    i, j, n, soma: integer;
+    x: real;
+    ok: boolean;
+    s: string;
+    v: array[1..10] of integer;
+begin
+"""
+
+
+def statement(rng):
+    """One random statement over the variables declared in HEADER."""
+    kind = rng.randrange(8)
+    if kind == 0:
+        return f"    soma := soma + i * {rng.randint(1, 99)} - (j % 7);\n"
+    if kind == 1:
+        return f"    writeln('Valor de soma: ', soma, ' e de i: ', i);\n"
+    if kind == 2:
+        return (f"    if (i <= n) and (v[{rng.randint(1, 10)}] > 0) then\n"
+                f"        j := j + 1\n"
+                f"    else\n"
+                f"        j := j - 1;\n")
+    if kind == 3:
+        return f"    {{ comentario numero {rng.randint(0, 10 ** 6)} }}\n    x := x * 1.5 + {rng.randint(0, 9)}.25;\n"
+    if kind == 4:
+        return (f"    for i := 1 to {rng.randint(2, 10)} do\n"
+                f"        soma := soma + v[i];\n")
+    if kind == 5:
+        return "    while j < n do\n    begin\n        j := j + 2;\n        ok := not ok;\n    end;\n"
+    if kind == 6:
+        return f"    (* outro comentario *) s := 'linha {rng.randint(0, 999)}';\n"
+    return f"    n := {rng.randint(0, 1000)};\n"
+
+
+def program(statements, seed=53):
+    """A complete program with the given number of random statements."""
+    rng = random.Random(seed)
+    parts = [HEADER]
+    parts.extend(statement(rng) for _ in range(statements))
+    parts.append("end.\n")
+    return "".join(parts)
+
+
+def program_of_size(size_bytes, seed=53):
+    """A complete program of roughly size_bytes characters."""
+    rng = random.Random(seed)
+    parts = [HEADER]
+    total = len(HEADER)
+    while total < size_bytes:
+        line = statement(rng)
+        parts.append(line)
+        total += len(line)
+    parts.append("end.\n")
+    return "".join(parts)
+
+
+def write_program_of_size(f, size_bytes, seed=53):
+    """Write program_of_size(size_bytes, seed) to f without building it in memory."""
+    rng = random.Random(seed)
+    f.write(HEADER)
+    total = len(HEADER)
+    while total < size_bytes:
+        line = statement(rng)
+        f.write(line)
+        total += len(line)
+    f.write("end.\n")
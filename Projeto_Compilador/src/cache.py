@@ -0,0 +1,103 @@
+# cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+
+
+class CompileCache:
+    """On-disk cache of generated VM code, addressed by the hash of the source.
+
+    Entries live in <directory>/<2 hex chars>/<sha256>.json. The key covers
+    the source text, the compiler fingerprint and the compile options, so a
+    new compiler or different options never reuse old output. When the
+    directory grows past max_bytes the least recently used entries (oldest
+    mtime; hits touch the file) are removed.
+    """
+
+    def __init__(self, directory, fingerprint, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = None  # total size on disk, computed on the first store
+
+    def key(self, source, options=''):
+        """Key of a source, given as text or as bytes-like UTF-8 (e.g. an mmap)."""
+        digest = hashlib.sha256("\0".join((self.fingerprint, options, '')).encode('utf-8'))
+        digest.update(source.encode('utf-8') if isinstance(source, str) else source)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key):
+        """Return the cached entry (a dict) or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry (any JSON-serialisable dict) under key."""
+        path = self._path(key)
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escreve num temporário e renomeia: nunca fica meio ficheiro na cache
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._entries())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.size = total
+
+    def clear(self):
+        for path, _, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.size = 0
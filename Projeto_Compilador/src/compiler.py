@@ -0,0 +1,254 @@
+# compiler.py
+
+import hashlib
+import mmap
+import os
+import fast_lex
+import pascal_lex
+import pascal_sin
+from cache import CompileCache
+from optimizer import fold_constants, hoist_invariants, merge_writes
+from peephole import PeepholeOptimizer, validate_rules
+from semantic import annotate_types
+from translator import UNROLL_BUDGET, UNROLL_FACTOR, Translator
+
+COMPILER_VERSION = "1.0"
+
+# Optimization levels: 0 translates the AST as parsed, 1 folds constants,
+# moves loop invariants out of loops, merges constant write arguments,
+# tests loops at the bottom and runs the peephole optimizer over the VM
+# code, 2 also unrolls for loops with constant bounds
+OPT_LEVELS = (0, 1, 2)
+
+# Default location of the compile cache (next to the PLY tables)
+CACHE_DIR = os.path.join(pascal_lex.CACHE_DIR, 'vm_cache')
+
+# Lexer backends: both produce the same token stream
+LEXERS = {
+    'ply': pascal_lex.lexer,
+    'fast': fast_lex.lexer,
+}
+
+_fingerprint = None
+
+
+def compiler_fingerprint():
+    """Version plus a hash of the compiler sources, so edits invalidate the cache."""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha1(COMPILER_VERSION.encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(here)):
+            if name.endswith('.py'):
+                with open(os.path.join(here, name), 'rb') as f:
+                    digest.update(f.read())
+        _fingerprint = f"{COMPILER_VERSION}-{digest.hexdigest()[:16]}"
+    return _fingerprint
+
+
+def open_cache(directory=None, max_bytes=64 * 1024 * 1024):
+    """Return a CompileCache for the current compiler."""
+    return CompileCache(directory or CACHE_DIR, compiler_fingerprint(), max_bytes)
+
+
+class CompileResult:
+    """Outcome of compiling one program."""
+
+    def __init__(self, ast=None, vm_code=None, errors=None, warnings=None):
+        self.ast = ast
+        self.vm_code = vm_code
+        self.errors = errors if errors is not None else []
+        self.warnings = warnings if warnings is not None else []
+        self.stats = {}  # counters of the optimization passes
+        self.cached = False
+
+    @property
+    def success(self):
+        return not self.errors and self.vm_code is not None
+
+
+class CompilerSession:
+    """Lexer, parser and diagnostics of one compilation at a time.
+
+    Each session owns a clone of the lexer and a copy of the parser, so
+    different sessions never share state: use one per thread (or per
+    request) and call compile() as many times as needed. With a
+    CompileCache, programs compiled before skip lexing, parsing and
+    translation (the cached result has no AST). lexer_backend picks one of
+    LEXERS; bytes-like sources (see compile_file) always use the fast lexer.
+    opt_level is one of OPT_LEVELS; peephole_rules names the peephole.RULES
+    used from -O1 on (all of them by default); unroll_budget and
+    unroll_factor are the limits of for loop unrolling at -O2 (see
+    StatementTranslator.translate_for). check_bounds checks array indices
+    at run time, except where ranges.RangeAnalyzer proves them in bounds.
+    string_pool keeps the string literals used more than once (or in a
+    loop) in globals pushed once, before START.
+    """
+
+    def __init__(self, cache=None, lexer_backend='ply', opt_level=0, peephole_rules=None,
+                 unroll_budget=UNROLL_BUDGET, unroll_factor=UNROLL_FACTOR, check_bounds=False,
+                 string_pool=False):
+        if opt_level not in OPT_LEVELS:
+            raise ValueError(f"Unknown optimization level: {opt_level}")
+        if unroll_budget < 0 or unroll_factor < 1:
+            raise ValueError("unroll_budget must be >= 0 and unroll_factor >= 1")
+        self.lexer = LEXERS[lexer_backend].clone()
+        self.binary_lexer = None
+        self.parser = pascal_sin.new_parser()
+        self.semantic_errors = []
+        self.symbols = {}  # nome -> semantic.Symbol do último programa (ver bind)
+        self.cache = cache
+        self.opt_level = opt_level
+        self.peephole_rules = None if peephole_rules is None else tuple(peephole_rules)
+        self.unroll_budget = unroll_budget if opt_level >= 2 else 0
+        self.unroll_factor = unroll_factor
+        self.check_bounds = check_bounds
+        self.string_pool = string_pool
+        if self.peephole_rules is not None:
+            validate_rules(self.peephole_rules)
+        # Opções que mudam o código gerado: fazem parte da chave da cache
+        self.options = f"O{opt_level}"
+        if opt_level >= 1 and self.peephole_rules is not None:
+            self.options += " peephole=" + ",".join(self.peephole_rules)
+        if opt_level >= 2 and (unroll_budget, unroll_factor) != (UNROLL_BUDGET, UNROLL_FACTOR):
+            self.options += f" unroll={unroll_budget}x{unroll_factor}"
+        if check_bounds:
+            self.options += " checked"
+        if string_pool:
+            self.options += " pool"
+
+    def reset(self, lexer=None):
+        """Forget the diagnostics of the previous compilation."""
+        lexer = lexer or self.lexer
+        self.parser.syntax_errors.clear()
+        self.parser.warnings.clear()
+        self.semantic_errors.clear()
+        self.symbols = {}
+        lexer.lineno = 1
+        lexer.diagnostics = self.parser.warnings
+
+    def _lexer_for(self, text):
+        if isinstance(text, str) or isinstance(self.lexer, fast_lex.FastLexer):
+            return self.lexer
+        # Só o lexer rápido lê bytes diretamente
+        if self.binary_lexer is None:
+            self.binary_lexer = fast_lex.lexer.clone()
+        return self.binary_lexer
+
+    def parse(self, text):
+        """Parse source text (str or bytes-like UTF-8) and return the AST, its names
+        bound and its expressions annotated (see bind).
+
+        Returns None on syntax errors, or when bind() finds errors.
+        """
+        lexer = self._lexer_for(text)
+        self.reset(lexer)
+        try:
+            ast = self.parser.parse(text, lexer=lexer)
+            if ast is not None and not self.parser.syntax_errors:
+                self.bind(ast, lexer)
+        finally:
+            # Não guarda uma referência ao texto (ou a um mmap já fechado),
+            # nem as folhas partilhadas desta árvore
+            lexer.input('')
+            self.parser.leaves.clear()
+            lexer.line_index = None
+        if self.parser.syntax_errors or self.semantic_errors:
+            return None
+        return ast
+
+    def bind(self, ast, lexer):
+        """Resolve the names of ast (semantic.annotate_types) and report, all at
+        once, the undeclared and duplicate ones and the constant indices out of
+        bounds.
+
+        This is the only time the names are bound: symbols keeps the Symbols,
+        which the passes and the translator share (the hoister adds those of
+        its globals), and the passes keep the tree annotated."""
+        annotator = annotate_types(ast)
+        self.symbols = annotator.symbols
+        errors = annotator.errors
+        if not errors:
+            return
+        index = pascal_lex.line_index(lexer)
+        for lexpos, message in sorted(errors, key=lambda error: error[0]):
+            line, col = index.position(lexpos)
+            self.semantic_errors.append(f"Error at line {line}, column {col}: {message}")
+
+    def compile_file(self, path, use_mmap=False):
+        """Compile a UTF-8 source file.
+
+        With use_mmap the file is memory-mapped and lexed chunk by chunk, so
+        its text is never held in memory as a whole (only the AST and the
+        VM code are). Positions in diagnostics then count bytes.
+        """
+        if not use_mmap or os.path.getsize(path) == 0:
+            with open(path, 'r', encoding='utf-8') as f:
+                return self.compile(f.read())
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.compile(data)
+
+    def compile(self, text):
+        """Compile source text (str or bytes-like UTF-8) to VM code."""
+        if self.cache is None:
+            return self._compile(text)
+
+        key = self.cache.key(text, self.options)
+        entry = self.cache.get(key)
+        if entry is not None:
+            result = CompileResult(vm_code=entry['vm_code'], warnings=entry['warnings'])
+            result.cached = True
+            return result
+        result = self._compile(text)
+        if result.success:
+            self.cache.put(key, {'vm_code': result.vm_code, 'warnings': result.warnings})
+        return result
+
+    def _compile(self, text):
+        result = CompileResult()
+        try:
+            result.ast = self.parse(text)
+        except Exception as e:
+            result.errors.append(f"Parse error: {type(e).__name__}: {e}")
+        result.warnings = list(self.parser.warnings)
+        if result.errors:
+            return result
+        if result.ast is None:
+            result.errors.extend(self.parser.syntax_errors)
+            result.errors.extend(self.semantic_errors)
+            if not result.errors:
+                result.errors.append("Parsing failed, see the warnings above.")
+            return result
+
+        try:
+            if self.opt_level >= 1:
+                folder = fold_constants(result.ast)
+                result.stats['fold.folded'] = folder.folded
+                result.stats['fold.simplified'] = folder.simplified
+                hoister = hoist_invariants(result.ast, self.symbols)
+                result.stats['licm.hoisted'] = hoister.hoisted
+                result.stats['writes.merged'] = merge_writes(result.ast).merged
+            translator = Translator(rotate_loops=self.opt_level >= 1, unroll_budget=self.unroll_budget,
+                                    unroll_factor=self.unroll_factor, check_bounds=self.check_bounds,
+                                    string_pool=self.string_pool)
+            code = translator.emit_program(result.ast, self.symbols)
+            if self.check_bounds:
+                result.stats['bounds.checks'] = translator.checks
+                result.stats['bounds.elided'] = translator.checks_elided
+            if self.string_pool:
+                result.stats['strings.pooled'] = translator.pooled
+            if self.opt_level >= 1:
+                peephole = PeepholeOptimizer(self.peephole_rules)
+                code = peephole.optimize(code)
+                for name, hits in peephole.hits.items():
+                    result.stats['peephole.' + name] = hits
+            result.vm_code = code.render()
+        except Exception as e:
+            result.errors.append(f"Translation error: {type(e).__name__}: {e}")
+        return result
+
+
+def compile_source(text):
+    """Compile source text in a fresh session and return a CompileResult."""
+    return CompilerSession().compile(text)
@@ -0,0 +1,230 @@
+# fast_lex.py
+"""Single-regex lexer producing the same tokens as pascal_lex.
+
+All rules of pascal_lex are folded into one compiled pattern whose
+alternatives are tried in the same order PLY tries the rules. The pattern
+also matches blanks and any other single character, so findall() splits a
+chunk of the input into contiguous pieces (no match objects, positions are
+running sums) and each piece is classified by its first character. The
+lexer object offers the part of the PLY lexer interface the parser uses
+(input, token, clone, lineno, lexpos, lexdata).
+
+The input may also be bytes or an mmap of UTF-8 text: each chunk is then
+decoded on its own, so a memory-mapped file is lexed without ever holding
+its whole text in memory. Names and string literals are interned, as in
+pascal_lex.
+"""
+import copy
+import re
+from sys import intern
+from pascal_lex import reserved, report_error
+
+_RULES = r"""
+    ([ \t\n]*)              # t_ignore and t_newline, skipped before a token
+    (
+      \{[^}]*\}             # t_COMMENT_BRACKETS
+    | \(\*.*?\*\)           # t_COMMENT_PARENTESIS
+    | :=                    # t_ATRIB
+    | <> | <= | >=          # t_NE, t_LE, t_GE (t_LT, t_GT, t_EQUALS below)
+    | \d+\.\d+              # t_NUM_REAL
+    | \d+                   # t_NUM
+    | '[^']*'               # t_STRING
+    | [A-Za-z][A-Za-z0-9]*  # t_VARNAME
+"""
+
+# Whole input: anything else is a literal, '<', '>', '=' or an invalid
+# character; \Z keeps the blanks at the very end
+_PIECES = re.compile(_RULES + r"| \Z | . )", re.VERBOSE | re.DOTALL)
+
+# Inside a chunk: a comment or string still open at the chunk end becomes
+# one last piece, so the lexer can tell it was cut and read further
+_CHUNK_PIECES = re.compile(_RULES + r"""
+    | \{[^}]*\Z | \(\*.*\Z | '[^']*\Z
+    | \Z | .
+    )
+""", re.VERBOSE | re.DOTALL)
+
+# Piece classes, by first character
+_NAME, _LITERAL, _DIGIT, _REL, _COLON, _PAREN, _BRACE, _QUOTE = range(8)
+
+_CLASS = {'{': _BRACE, '(': _PAREN, ':': _COLON, '<': _REL, '>': _REL, '=': _REL, "'": _QUOTE}
+_CLASS.update((c, _DIGIT) for c in '0123456789')
+_CLASS.update((c, _NAME) for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+_CLASS.update((c, _LITERAL) for c in '+-*%/;)[].,')
+
+_RELOPS = {'<>': 'NE', '<=': 'LE', '>=': 'GE', '<': 'LT', '>': 'GT', '=': 'EQUALS'}
+
+# Openers and closers of the constructs that may span several lines
+_DELIMITERS = {'{': ('{', '}'), "'": ("'", "'"), '(': ('(*', '*)')}
+
+CHUNK_SIZE = 1 << 16
+
+
+def _is_cut(piece):
+    """True for a piece matched by one of the chunk-end alternatives."""
+    first = piece[:1]
+    if first == '{':
+        return len(piece) < 2 or piece[-1] != '}'
+    if first == "'":
+        return len(piece) < 2 or piece[-1] != "'"
+    if piece.startswith('(*'):
+        return len(piece) < 4 or not piece.endswith('*)')
+    return False
+
+
+class Token:
+    """Same attributes as ply.lex.LexToken."""
+
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f"LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+
+class FastLexer:
+    """Drop-in replacement for the PLY lexer of pascal_lex.
+
+    token() returns the next token, or None at the end of the input. It is
+    the __next__ of the generator set up by input(), so fetching a token
+    costs no Python call of its own.
+    """
+
+    def __init__(self):
+        self.lineno = 1
+        self.input('')
+
+    def clone(self):
+        """Independent copy that goes on from the current position."""
+        other = copy.copy(self)
+        other._pieces = []
+        other._chunk_end = self.lexpos
+        other.token = other._generate().__next__
+        return other
+
+    def input(self, data):
+        """Start lexing data: a str, or bytes-like UTF-8 text (e.g. an mmap).
+
+        For bytes-like input lexpos counts bytes instead of characters.
+        """
+        self.lexdata = data
+        self._binary = not isinstance(data, str)
+        self.lexpos = 0
+        self.lexlen = len(data)
+        self._pieces = []
+        self._chunk_end = 0
+        self.token = self._generate().__next__
+
+    def _split(self, start, end):
+        pattern = _PIECES if end == self.lexlen else _CHUNK_PIECES
+        if self._binary:
+            # latin-1 dá um caráter por byte: as posições continuam a ser bytes
+            return pattern.findall(self.lexdata[start:end].decode('latin-1'))
+        return pattern.findall(self.lexdata, start, end)
+
+    def _fill(self):
+        """Split the next chunk (ending after a newline) into pieces."""
+        data = self.lexdata
+        length = self.lexlen
+        newline_char = b'\n' if self._binary else '\n'
+        start = self._chunk_end
+        end = start + CHUNK_SIZE
+        if end >= length:
+            end = length
+        else:
+            newline = data.find(newline_char, end)
+            end = length if newline < 0 else newline + 1
+        pieces = self._split(start, end)
+
+        # A comment or string cut by the chunk end: lex again from its start
+        # up to the line that closes it (or to the end if it never closes)
+        # (a cut piece runs to the chunk end, where \Z then adds an empty one)
+        while end < length and len(pieces) > 1 and pieces[-1] == ('', '') and _is_cut(pieces[-2][1]):
+            del pieces[-1]
+            blanks, piece = pieces.pop()
+            pos = end - len(piece) - len(blanks)
+            opener, closer = _DELIMITERS[piece[0]]
+            if self._binary:
+                closer = closer.encode()
+            close = data.find(closer, end - len(piece) + len(opener))
+            newline = data.find(newline_char, close) if close >= 0 else -1
+            end = length if newline < 0 else newline + 1
+            pieces.extend(self._split(pos, end))
+
+        self._pieces = pieces
+        self._chunk_end = end
+
+    def _generate(self):
+        # Estado em variáveis locais: o gerador é retomado a cada token
+        classes = _CLASS
+        keywords = reserved
+        relops = _RELOPS
+        binary = self._binary
+        pos = self.lexpos
+        lineno = self.lineno
+        while self._chunk_end < self.lexlen:
+            self._fill()
+            for blanks, piece in self._pieces:
+                if blanks:
+                    pos += len(blanks)
+                    if '\n' in blanks:
+                        lineno += blanks.count('\n')
+                start = pos
+                pos += len(piece)
+                kind = classes.get(piece[:1])
+
+                if kind == _NAME:
+                    tok = Token(keywords.get(piece.lower(), 'VARNAME'), intern(piece), lineno, start)
+                elif kind == _LITERAL:
+                    tok = Token(piece, piece, lineno, start)
+                elif kind == _DIGIT:
+                    if '.' in piece:
+                        tok = Token('NUM_REAL', float(piece), lineno, start)
+                    else:
+                        tok = Token('NUM', int(piece), lineno, start)
+                elif kind == _REL:
+                    tok = Token(relops[piece], piece, lineno, start)
+                elif kind == _QUOTE and len(piece) > 1:
+                    value = piece[1:-1]
+                    if binary and not value.isascii():
+                        value = value.encode('latin-1').decode('utf-8', 'replace')
+                    tok = Token('STRING', intern(value), lineno, start)
+                elif kind == _COLON:
+                    tok = Token('ATRIB' if len(piece) > 1 else piece, piece, lineno, start)
+                elif kind == _PAREN and len(piece) == 1:
+                    tok = Token(piece, piece, lineno, start)
+                elif (kind == _PAREN or kind == _BRACE) and len(piece) > 1:
+                    lineno += piece.count('\n')
+                    continue
+                elif not piece:
+                    continue
+                else:
+                    # Mesmo comportamento do t_error: reporta e salta um caráter
+                    # (com bytes, um caráter não-ASCII é reportado byte a byte)
+                    self.lineno = lineno
+                    report_error(self, piece, lineno)
+                    continue
+                self.lexpos = pos
+                self.lineno = lineno
+                yield tok
+        self.lexpos = pos
+        self.lineno = lineno
+        while True:
+            yield None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        tok = self.token()
+        if tok is None:
+            raise StopIteration
+        return tok
+
+
+lexer = FastLexer()
@@ -0,0 +1,108 @@
+# ir.py
+"""Instruction IR the translators emit into.
+
+A Code object keeps one opcode (an Op, stored as a byte) and one operand
+per instruction in two parallel arrays. Labels are instructions too (Op.LABEL
+with the label name as operand), so passes can rewrite the stream without
+parsing text; render() produces the text of Output.txt once, at the end.
+"""
+import enum
+from array import array
+
+
+class Op(enum.IntEnum):
+    LABEL = 0
+    # Constantes e variáveis globais
+    PUSHI = enum.auto()
+    PUSHF = enum.auto()
+    PUSHS = enum.auto()
+    PUSHG = enum.auto()
+    STOREG = enum.auto()
+    DUP = enum.auto()
+    # Memória dinâmica (arrays)
+    ALLOCN = enum.auto()
+    LOADN = enum.auto()
+    STOREN = enum.auto()
+    LOAD = enum.auto()
+    STORE = enum.auto()
+    CHECK = enum.auto()
+    # Entrada e saída
+    READ = enum.auto()
+    ATOI = enum.auto()
+    ATOF = enum.auto()
+    WRITEI = enum.auto()
+    WRITEF = enum.auto()
+    WRITES = enum.auto()
+    WRITELN = enum.auto()
+    # Aritmética, comparação e lógica
+    ADD = enum.auto()
+    SUB = enum.auto()
+    MUL = enum.auto()
+    DIV = enum.auto()
+    MOD = enum.auto()
+    EQUAL = enum.auto()
+    INF = enum.auto()
+    INFEQ = enum.auto()
+    SUP = enum.auto()
+    SUPEQ = enum.auto()
+    AND = enum.auto()
+    OR = enum.auto()
+    NOT = enum.auto()
+    # Controlo
+    JUMP = enum.auto()
+    JZ = enum.auto()
+    START = enum.auto()
+    STOP = enum.auto()
+
+
+_OPS = list(Op)
+_NAMES = [op.name for op in Op]
+
+
+def render_instruction(op, arg):
+    """Text of one instruction, as in Output.txt."""
+    if op == Op.LABEL:
+        return f"{arg}:"
+    if arg is None:
+        return _NAMES[op]
+    if op == Op.PUSHS:
+        return f"PUSHS \"{arg}\""
+    if op == Op.CHECK:
+        return f"CHECK {arg[0]}, {arg[1]}"
+    return f"{_NAMES[op]} {arg}"
+
+
+class Code:
+    """A stream of VM instructions: parallel arrays of opcodes and operands."""
+
+    __slots__ = ('ops', 'args')
+
+    def __init__(self, instructions=()):
+        self.ops = array('B')
+        self.args = []
+        for op, arg in instructions:
+            self.emit(op, arg)
+
+    def emit(self, op, arg=None):
+        self.ops.append(op)
+        self.args.append(arg)
+
+    def label(self, name):
+        self.ops.append(Op.LABEL)
+        self.args.append(name)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        """(Op, operand) of every instruction."""
+        ops = _OPS
+        return ((ops[op], arg) for op, arg in zip(self.ops, self.args))
+
+    def instruction_count(self):
+        """Number of instructions, labels not counted."""
+        return len(self.ops) - self.ops.count(Op.LABEL)
+
+    def render(self):
+        """The instructions as lines of text (the format of Output.txt)."""
+        return [render_instruction(op, arg) for op, arg in zip(self.ops, self.args)]
@@ -1,13 +1,16 @@
+import argparse
+import glob
+import os
 import re
 import sys
-import pascal_lex
-import pascal_sin
-from pascal_lex import lexer
-from pascal_sin import parser, syntax_errors
-from translator import Translator
+import time
+from concurrent.futures import ProcessPoolExecutor
+from compiler import CACHE_DIR, LEXERS, OPT_LEVELS, CompilerSession, open_cache
+from translator import UNROLL_BUDGET, UNROLL_FACTOR
+from peephole import RULES
 
 
-def main():
+def interactive():
     files = [
         "Fatorial.pas",
         "Mundo_talk.pas",
@@ -47,21 +50,14 @@ def main():
         print(f"File '../tests/{filename}' not found.")
         sys.exit(1)
 
-   # Parse input
-    parser = pascal_sin.parser
-    parser.success = True
-    ast = parser.parse(code, lexer=pascal_sin.lexer)
-    if syntax_errors:
-        parser.success = False
-        for e in syntax_errors:
-            print(e)
+    # Parse and translate
+    result = CompilerSession().compile(code)
+    for w in result.warnings:
+        print(w)
 
-    if parser.success:
-        # Translate AST to VM code
-        print("AST:", ast)
-        translator = Translator()
-        vm_code = translator.translate_program(ast)
-        # print(translator.symbol_table.variables)
+    if result.success:
+        print("AST:", result.ast)
+        vm_code = result.vm_code
 
         print("Generated VM Code:")
         for line in vm_code:
@@ -70,8 +66,224 @@ def main():
         with open("../results/Output.txt", "w") as f:
             f.write("\n".join(vm_code))
     else:
+        for e in result.errors:
+            print(e)
         print("Translation failed due to parsing errors.")
 
 
+#########################
+# Batch mode
+#########################
+def collect_sources(patterns):
+    """Expand files, directories (every *.pas inside) and glob patterns."""
+    sources = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.pas")))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            print(f"Warning: '{pattern}' did not match any file", file=sys.stderr)
+        sources.extend(matches)
+    # Mantém a ordem mas sem repetidos
+    return list(dict.fromkeys(sources))
+
+
+def output_path(source, output_dir, root):
+    """Output file for a source: next to it, or under output_dir at the path of
+    the source relative to root (so sources of the same name in different
+    directories are not written to the same file)."""
+    if output_dir is None:
+        return os.path.splitext(source)[0] + ".txt"
+    relative = os.path.relpath(os.path.abspath(source), root)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".txt")
+
+
+def sources_root(sources):
+    """Innermost directory holding every source."""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in sources])
+
+
+def colliding_targets(sources, targets):
+    """(first source, second source, target) for every output file two sources would share."""
+    collisions = []
+    seen = {}
+    for source, target in zip(sources, targets):
+        # x.pas e x.PAS: o mesmo ficheiro onde os nomes não distinguem maiúsculas
+        key = os.path.normcase(os.path.abspath(target))
+        if key in seen:
+            collisions.append((seen[key], source, target))
+        else:
+            seen[key] = source
+    return collisions
+
+
+_cache = None
+
+
+def worker_cache(options):
+    """Compile cache of this worker process (None when caching is off)."""
+    global _cache
+    if options['cache_dir'] is None:
+        return None
+    if _cache is None or _cache.directory != options['cache_dir']:
+        _cache = open_cache(options['cache_dir'], options['cache_bytes'])
+    return _cache
+
+
+def cache_counters(cache):
+    """(hits, misses, evictions) of a CompileCache so far; zeros without one."""
+    if cache is None:
+        return (0, 0, 0)
+    return (cache.hits, cache.misses, cache.evictions)
+
+
+def compile_file(source, target, options):
+    """Compile one file and return (source, ok, seconds, messages, cache_counts):
+    cache_counts is how much this compilation added to cache_counters."""
+    start = time.perf_counter()
+    messages = []
+    cache = worker_cache(options)
+    before = cache_counters(cache)
+    try:
+        session = CompilerSession(cache=cache, lexer_backend=options['lexer'],
+                                  opt_level=options['opt_level'],
+                                  peephole_rules=options['peephole_rules'],
+                                  unroll_budget=options['unroll_budget'],
+                                  unroll_factor=options['unroll_factor'],
+                                  check_bounds=options['check_bounds'],
+                                  string_pool=options['string_pool'])
+        result = session.compile_file(source, use_mmap=options['mmap'])
+        messages.extend(result.warnings)
+        messages.extend(result.errors)
+        ok = result.success
+        if ok:
+            with open(target, "w") as f:
+                f.write("\n".join(result.vm_code))
+    except (OSError, UnicodeDecodeError) as e:
+        messages.append(f"{type(e).__name__}: {e}")
+        ok = False
+    counts = tuple(after - earlier for after, earlier in zip(cache_counters(cache), before))
+    return source, ok, time.perf_counter() - start, messages, counts
+
+
+def batch(args):
+    sources = collect_sources(args.inputs)
+    if not sources:
+        print("No input files.", file=sys.stderr)
+        return 2
+    root = sources_root(sources) if args.output_dir else None
+    targets = [output_path(source, args.output_dir, root) for source in sources]
+    collisions = colliding_targets(sources, targets)
+    for first, second, target in collisions:
+        print(f"Error: '{first}' and '{second}' would both be compiled to '{target}'", file=sys.stderr)
+    if collisions:
+        return 2
+    if args.output_dir:
+        # A árvore de diretórios das fontes é reproduzida em output_dir
+        for directory in sorted({os.path.dirname(target) for target in targets}):
+            os.makedirs(directory, exist_ok=True)
+
+    cache_dir = None if args.no_cache else (args.cache_dir or CACHE_DIR)
+    options = {
+        'cache_dir': cache_dir,
+        'cache_bytes': args.cache_size * 1024 * 1024,
+        'lexer': args.lexer,
+        'mmap': args.mmap,
+        'opt_level': args.opt_level,
+        'peephole_rules': args.peephole.split(',') if args.peephole else None,
+        'unroll_budget': args.unroll_budget,
+        'unroll_factor': args.unroll_factor,
+        'check_bounds': args.check_bounds,
+        'string_pool': args.string_pool,
+    }
+
+    start = time.perf_counter()
+    if args.jobs == 1 or len(sources) == 1:
+        results = [compile_file(s, t, options) for s, t in zip(sources, targets)]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(compile_file, sources, targets, [options] * len(sources)))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    cache_totals = [0, 0, 0]
+    for source, ok, seconds, messages, counts in results:
+        if not ok:
+            failed += 1
+        for i, count in enumerate(counts):
+            cache_totals[i] += count
+        cached = counts[0] > 0
+        if ok and args.quiet and not messages:
+            continue
+        print(f"{'OK  ' if ok else 'FAIL'} {seconds * 1000:8.1f} ms  {source}{'  (cached)' if cached else ''}")
+        for message in messages:
+            print(f"       {message}")
+    print(f"{len(results) - failed}/{len(results)} compiled, {failed} failed in {elapsed:.2f}s")
+    if cache_dir is not None:
+        hits, misses, evictions = cache_totals
+        print(f"cache: {hits} hits, {misses} misses, {evictions} evictions ({cache_dir})")
+    return 1 if failed else 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Pascal to VM compiler. Without inputs, starts the interactive menu.")
+    arg_parser.add_argument("inputs", nargs="*",
+                            help=".pas files, directories or glob patterns (e.g. 'src/**/*.pas')")
+    arg_parser.add_argument("-o", "--output-dir",
+                            help="directory for the generated code, with the layout of the "
+                                 "directories of the sources (default: next to each source)")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                            help="number of worker processes (default: CPU count)")
+    arg_parser.add_argument("-q", "--quiet", action="store_true",
+                            help="only report files that failed or produced messages")
+    arg_parser.add_argument("--lexer", choices=sorted(LEXERS), default="ply",
+                            help="lexer backend (default: ply)")
+    arg_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=0,
+                            help="optimization level (default: 0)")
+    arg_parser.add_argument("--peephole", metavar="RULES",
+                            help="comma-separated peephole rules used from -O1 on "
+                                 f"(default: all of {','.join(RULES)})")
+    arg_parser.add_argument("--unroll-budget", type=int, default=UNROLL_BUDGET, metavar="NODES",
+                            help="largest unrolled for loop body at -O2, in AST nodes "
+                                 f"(default: {UNROLL_BUDGET})")
+    arg_parser.add_argument("--unroll-factor", type=int, default=UNROLL_FACTOR, metavar="N",
+                            help="copies of the body per iteration when a for loop is too big "
+                                 f"to unroll fully at -O2 (default: {UNROLL_FACTOR})")
+    arg_parser.add_argument("--check-bounds", action="store_true",
+                            help="check array indices at run time (CHECK), except where they are "
+                                 "proven in bounds")
+    arg_parser.add_argument("--string-pool", action="store_true",
+                            help="push the string literals used more than once (or in a loop) "
+                                 "once, into hidden globals, instead of at every use")
+    arg_parser.add_argument("--mmap", action="store_true",
+                            help="memory-map the sources and lex them in place (uses the fast lexer)")
+    arg_parser.add_argument("--no-cache", action="store_true",
+                            help="always compile, ignoring and not updating the compile cache")
+    arg_parser.add_argument("--cache-dir",
+                            help="compile cache directory (default: src/__pycache__/vm_cache)")
+    arg_parser.add_argument("--cache-size", type=int, default=64,
+                            help="compile cache size limit in MiB (default: 64)")
+    args = arg_parser.parse_args()
+
+    if args.peephole:
+        unknown = [name for name in args.peephole.split(',') if name not in RULES]
+        if unknown:
+            arg_parser.error(f"unknown peephole rules: {', '.join(unknown)}")
+    if args.unroll_budget < 0 or args.unroll_factor < 1:
+        arg_parser.error("--unroll-budget must be >= 0 and --unroll-factor >= 1")
+    if args.jobs < 1:
+        arg_parser.error("--jobs must be >= 1")
+    if args.cache_size < 0:
+        arg_parser.error("--cache-size must be >= 0")
+    if not args.inputs:
+        interactive()
+        return
+    sys.exit(batch(args))
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,459 @@
+# optimizer.py
+"""AST passes run between parsing and translation (see CompilerSession).
+
+Like the translators, the passes are generators run by trampoline.run, so
+they walk trees of any depth.
+"""
+import trampoline
+from pascal_ast import (
+    ArrayAccess, Assign, BinOp, Compare, Compound, Expression, For, Formatted, If, Num, ReadLn,
+    Real, Str, UnaryOp, Var, VarDecl, While, Write, walk,
+)
+from semantic import Symbol, analyze_loops
+
+_ARITHMETIC = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+}
+
+_RELATIONAL = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+def is_num(exp, value=None):
+    return isinstance(exp, Num) and (value is None or exp.value == value)
+
+
+class ConstantFolder:
+    """Folds constant subexpressions and removes identity operations.
+
+    Only rewrites that give the same result on the VM are made: operands of
+    different kinds (integer and real) are left alone, integer division and
+    modulo are folded only for non-negative operands, and and/or only for
+    0/1 operands. Expressions are replaced in their parent node; folded and
+    simplified count the rewrites.
+    """
+
+    def __init__(self):
+        self.folded = 0
+        self.simplified = 0
+        self.statement_map = {
+            Assign: self.fold_assignment,
+            Write: self.fold_write,
+            ReadLn: self.fold_readln,
+            If: self.fold_if,
+            While: self.fold_while,
+            For: self.fold_for,
+            Compound: self.fold_compound,
+        }
+        self.expression_map = {
+            BinOp: self.fold_binary_op,
+            Compare: self.fold_relational_op,
+            UnaryOp: self.fold_unary_op,
+            ArrayAccess: self.fold_array_access,
+            Formatted: self.fold_formatted,
+        }
+
+    def fold_program(self, program):
+        trampoline.run(self.fold_statement(program.block.body))
+        return program
+
+    #########################
+    # Statements
+    #########################
+    def fold_statement(self, stmt):
+        folder = self.statement_map.get(type(stmt))
+        return folder(stmt) if folder else None
+
+    def fold_assignment(self, stmt):
+        stmt.exp = yield self.fold(stmt.exp)
+
+    def fold_write(self, stmt):
+        args = []
+        for arg in stmt.args:
+            args.append((yield self.fold(arg)))
+        stmt.args = args
+
+    def fold_readln(self, stmt):
+        stmt.target = yield self.fold(stmt.target)
+
+    def fold_if(self, stmt):
+        stmt.condition = yield self.fold(stmt.condition)
+        yield self.fold_statement(stmt.then_block)
+        yield self.fold_statement(stmt.else_block)
+
+    def fold_while(self, stmt):
+        stmt.condition = yield self.fold(stmt.condition)
+        yield self.fold_statement(stmt.body)
+
+    def fold_for(self, stmt):
+        stmt.start = yield self.fold(stmt.start)
+        stmt.stop = yield self.fold(stmt.stop)
+        yield self.fold_statement(stmt.body)
+
+    def fold_compound(self, stmt):
+        for sub_stmt in stmt.statements:
+            yield self.fold_statement(sub_stmt)
+
+    #########################
+    # Expressions
+    #########################
+    def fold(self, exp):
+        """exp folded (a new node, or exp itself rewritten in place); a generator
+        when exp has children to fold."""
+        folder = self.expression_map.get(type(exp))
+        return folder(exp) if folder else exp
+
+    def fold_array_access(self, exp):
+        exp.index = yield self.fold(exp.index)
+        return exp
+
+    def fold_formatted(self, exp):
+        exp.exp = yield self.fold(exp.exp)
+        return exp
+
+    def fold_binary_op(self, exp):
+        left = exp.left = yield self.fold(exp.left)
+        right = exp.right = yield self.fold(exp.right)
+        op = exp.op
+
+        # Constantes dos dois lados, do mesmo tipo
+        if type(left) is type(right) and isinstance(left, (Num, Real)):
+            a, b = left.value, right.value
+            value = None
+            if op in _ARITHMETIC:
+                value = _ARITHMETIC[op](a, b)
+            elif isinstance(left, Num) and op in ('/', '%') and a >= 0 and b > 0:
+                value = a // b if op == '/' else a % b
+            elif isinstance(left, Num) and op in ('and', 'or') and a in (0, 1) and b in (0, 1):
+                value = (a & b) if op == 'and' else (a | b)
+            if value is not None:
+                self.folded += 1
+                return type(left)(value)
+
+        # Identidades: x + 0, 0 + x, x - 0, x * 1, 1 * x, x / 1
+        if (op == '+' and is_num(right, 0)) or (op == '-' and is_num(right, 0)) \
+                or (op == '*' and is_num(right, 1)) or (op == '/' and is_num(right, 1)):
+            self.simplified += 1
+            return left
+        if (op == '+' and is_num(left, 0)) or (op == '*' and is_num(left, 1)):
+            self.simplified += 1
+            return right
+        return exp
+
+    def fold_relational_op(self, exp):
+        left = exp.left = yield self.fold(exp.left)
+        right = exp.right = yield self.fold(exp.right)
+        if type(left) is type(right) and isinstance(left, (Num, Real)):
+            self.folded += 1
+            return Num(int(_RELATIONAL[exp.op](left.value, right.value)))
+        return exp
+
+    def fold_unary_op(self, exp):
+        operand = exp.operand = yield self.fold(exp.operand)
+        if exp.op == '-':
+            if isinstance(operand, (Num, Real)):
+                self.folded += 1
+                return type(operand)(-operand.value)
+            if isinstance(operand, UnaryOp) and operand.op == '-':
+                self.simplified += 1
+                return operand.operand
+        elif exp.op == 'not' and isinstance(operand, Num):
+            # NOT da VM: 1 para 0, 0 para qualquer outro valor
+            self.folded += 1
+            return Num(int(operand.value == 0))
+        return exp
+
+
+def fold_constants(program):
+    """Run ConstantFolder over a Program and return the folder (for its counters)."""
+    folder = ConstantFolder()
+    folder.fold_program(program)
+    return folder
+
+
+#########################
+# Loop-invariant code motion
+#########################
+_HOISTABLE_TYPES = ('integer', 'real', 'boolean')
+_CONSTANT = -1  # LoopInvariantHoister.classify: o que não depende de variáveis
+
+
+class LoopInvariantHoister:
+    """Moves expressions a loop cannot change out of while and for bodies.
+
+    An expression is invariant in a loop when every variable in it is not
+    stored into anywhere in the loop (semantic.analyze_loops). It is moved
+    out of the outermost loop it is invariant in: computed once into a
+    hidden global ('#inv1', '#inv2', ..., declared at the end of the var
+    section) by an assignment placed just before that loop, and replaced by
+    that global inside it. Only expressions that cannot fail are moved,
+    since the loop may run zero times: / and % (division by zero) and array
+    accesses (index out of bounds) stay in place, as do strings. Equal
+    expressions of one loop share a global; hoisted counts the globals.
+
+    The program must be annotated (CompilerSession.parse): the Symbols of
+    the globals are added to symbols, the map the annotation built, and
+    given to the nodes that use them, so the tree stays bound.
+
+    The tree is walked once, with the loops around the current statement
+    on a stack, outermost first. The stores of a loop include those of
+    the loops inside it, so a variable is invariant from some level of the
+    stack inwards and that level is found by bisection.
+    """
+
+    def __init__(self, program, symbols):
+        self.program = program
+        self.symbols = symbols
+        self.hoisted = 0
+        self.provisional = 0
+        self.loops = {}
+        # (ciclo, hoisted) dos ciclos à volta da instrução atual; hoisted:
+        # repr da expressão -> (expressão, nós que recebem o nome do global,
+        # Symbol do global)
+        self.stack = []
+        # hoisted de cada ciclo, pela ordem em que se entra neles (numeração)
+        self.entered = []
+        self.statement_map = {
+            If: self.hoist_if,
+            While: self.hoist_loop,
+            For: self.hoist_loop,
+            Compound: self.hoist_compound,
+        }
+
+    def hoist_program(self, program):
+        self.loops = analyze_loops(program)
+        program.block.body = trampoline.run(self.hoist_statement(program.block.body))
+        # Os globais são numerados no fim: ciclos exteriores primeiro
+        for hoisted in self.entered:
+            for exp, nodes, symbol in hoisted.values():
+                self.hoisted += 1
+                name = symbol.name = f"#inv{self.hoisted}"
+                self.symbols[name] = symbol
+                for node in nodes:
+                    node.name = name
+                self.program.block.declarations.append(VarDecl([name], exp.type, symbol.lexpos))
+        return program
+
+    #########################
+    # Statements
+    #########################
+    def hoist_statement(self, stmt):
+        """Return stmt, or the Compound of the hoisted assignments and stmt."""
+        hoister = self.statement_map.get(type(stmt))
+        if hoister:
+            return hoister(stmt)
+        if self.stack and stmt is not None:
+            return self.hoist_simple(stmt)
+        return stmt
+
+    def hoist_simple(self, stmt):
+        for node in walk(stmt):
+            yield self.replace_children(node)
+        return stmt
+
+    def hoist_if(self, stmt):
+        yield self.replace_children(stmt)
+        stmt.then_block = yield self.hoist_statement(stmt.then_block)
+        stmt.else_block = yield self.hoist_statement(stmt.else_block)
+        return stmt
+
+    def hoist_compound(self, stmt):
+        statements = []
+        for sub_stmt in stmt.statements:
+            statements.append((yield self.hoist_statement(sub_stmt)))
+        stmt.statements = statements
+        return stmt
+
+    def hoist_loop(self, stmt):
+        # Limites do for e condição do while, para os ciclos de fora
+        yield self.replace_children(stmt)
+        hoisted = {}
+        self.stack.append((stmt, hoisted))
+        self.entered.append(hoisted)
+        stmt.body = yield self.hoist_statement(stmt.body)
+        if isinstance(stmt, While):
+            # O que da condição só sai deste ciclo
+            stmt.condition = yield self.replace(stmt.condition)
+        self.stack.pop()
+        if not hoisted:
+            return stmt
+        assignments = []
+        for exp, nodes, symbol in hoisted.values():
+            assignment = Assign(symbol.name, exp, stmt.lexpos)
+            assignment.symbol = symbol
+            nodes.append(assignment)
+            assignments.append(assignment)
+        return Compound(assignments + [stmt], stmt.lexpos)
+
+    #########################
+    # Expressions
+    #########################
+    def replace_children(self, node):
+        """Replace the invariant expressions that are direct children of a statement."""
+        if isinstance(node, Expression) or not self.stack:
+            return
+        for name in type(node).__slots__:
+            value = getattr(node, name)
+            if isinstance(value, Expression):
+                setattr(node, name, (yield self.replace(value)))
+            elif isinstance(value, list):
+                items = []
+                for item in value:
+                    if isinstance(item, Expression):
+                        item = yield self.replace(item)
+                    items.append(item)
+                setattr(node, name, items)
+
+    def replace(self, exp):
+        """exp with its largest invariant subexpressions replaced by globals."""
+        level = yield self.classify(exp)
+        return self.hoist_if_invariant(exp, level)
+
+    def classify(self, exp):
+        """The outermost loop of the stack exp is invariant in (its index), _CONSTANT,
+        or None (may change in every loop, or may not be moved).
+
+        The invariant children of a node that is not, or that is invariant
+        only further in, are hoisted on the way."""
+        if isinstance(exp, (Num, Real)):
+            return _CONSTANT
+        if isinstance(exp, Var):
+            return self.var_level(exp.name) if exp.type in _HOISTABLE_TYPES else None
+        if isinstance(exp, ArrayAccess):
+            exp.index = yield self.replace(exp.index)
+            return None
+        if isinstance(exp, (BinOp, Compare)):
+            levels = ((yield self.classify(exp.left)), (yield self.classify(exp.right)))
+            movable = isinstance(exp, Compare) or (exp.op not in ('/', '%') and exp.type in _HOISTABLE_TYPES)
+            level = max(levels) if movable and None not in levels else None
+            exp.left = self.hoist_if_invariant(exp.left, levels[0], level)
+            exp.right = self.hoist_if_invariant(exp.right, levels[1], level)
+            return level
+        if isinstance(exp, UnaryOp):
+            return (yield self.classify(exp.operand))
+        # Strings e o que mais houver ficam onde estão
+        return None
+
+    def var_level(self, name):
+        """Index of the outermost loop that does not store into name, or None."""
+        low, high = 0, len(self.stack)
+        while low < high:
+            middle = (low + high) // 2
+            if self.stores_into(self.stack[middle][0], name):
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self.stack) else None
+
+    def stores_into(self, loop, name):
+        """True when the loop stores into name, in its body or as its counter."""
+        return self.loops[loop].stores_into(name) or (type(loop) is For and loop.var == name)
+
+    def hoist_if_invariant(self, exp, level, parent_level=None):
+        """exp, or its global when it is invariant in a loop further out than its parent."""
+        if level is None or level == _CONSTANT or level == parent_level:
+            return exp
+        return self.hoist(exp, level)
+
+    def hoist(self, exp, level):
+        """The hidden global holding exp (a Var), out of the loop at level of the stack;
+        a lone variable is left as it is."""
+        if isinstance(exp, Var):
+            return exp
+        loop, hoisted = self.stack[level]
+        key = repr(exp)
+        if key not in hoisted:
+            # Nome provisório (único, entra no repr das expressões de fora)
+            # até à numeração no fim
+            self.provisional += 1
+            # As posições são as do ciclo, antes do qual a expressão é calculada
+            hoisted[key] = (exp, [], Symbol(f"#inv?{self.provisional}", exp.type, loop.lexpos))
+        exp, nodes, symbol = hoisted[key]
+        var = Var(symbol.name, loop.lexpos)
+        var.symbol = symbol
+        nodes.append(var)
+        return var
+
+
+def hoist_invariants(program, symbols):
+    """Run LoopInvariantHoister over an annotated Program, adding the Symbols of
+    its globals to symbols, and return it (for its counter)."""
+    hoister = LoopInvariantHoister(program, symbols)
+    hoister.hoist_program(program)
+    return hoister
+
+
+#########################
+# Write coalescing
+#########################
+def constant_text(exp):
+    """What writing exp prints, when known at compile time (strings and integers), or None."""
+    if isinstance(exp, Str):
+        return exp.value
+    if isinstance(exp, Num):
+        # WRITEI imprime o inteiro em decimal
+        return str(exp.value)
+    return None
+
+
+class WriteMerger:
+    """Merges constant output into fewer VM write calls.
+
+    In a compound statement, a write followed by another write (or a
+    writeln) becomes one statement with the arguments of both; then, in
+    every write, each run of adjacent constant arguments becomes a single
+    string, so one PUSHS + WRITES replaces several pushes and writes.
+    Nothing is merged across a line break, and reals (WRITEF has its own
+    format) and formatted arguments stay as they are. merged counts the
+    arguments removed.
+    """
+
+    def __init__(self):
+        self.merged = 0
+
+    def merge_program(self, program):
+        # walk lê os filhos depois de cada nó: as listas já vêm reescritas
+        for node in walk(program.block.body):
+            if isinstance(node, Compound):
+                node.statements = self.merge_statements(node.statements)
+            elif isinstance(node, Write):
+                node.args = self.merge_args(node.args)
+        return program
+
+    def merge_statements(self, statements):
+        merged = []
+        for stmt in statements:
+            previous = merged[-1] if merged else None
+            if isinstance(stmt, Write) and isinstance(previous, Write) and not previous.newline:
+                previous.args.extend(stmt.args)
+                previous.newline = stmt.newline
+            else:
+                merged.append(stmt)
+        return merged
+
+    def merge_args(self, args):
+        merged = []
+        for arg in args:
+            text = constant_text(arg)
+            previous = constant_text(merged[-1]) if merged and text is not None else None
+            if previous is not None:
+                merged[-1] = Str(previous + text)
+                self.merged += 1
+            else:
+                merged.append(arg)
+        return merged
+
+
+def merge_writes(program):
+    """Run WriteMerger over a Program and return it (for its counter)."""
+    merger = WriteMerger()
+    merger.merge_program(program)
+    return merger
@@ -0,0 +1,310 @@
+# pascal_ast.py
+"""Typed AST nodes built by pascal_sin and consumed by the translator.
+
+Every node is a small class with __slots__ holding its fields. The
+declarations, the statements, Var and ArrayAccess also hold lexpos, the
+offset of the first token of the construct in the source (of each name
+for VarDecl); lines and columns are found from it with
+pascal_lex.line_index() when a diagnostic needs them. The literals and
+the operators, which no diagnostic points at, have no position.
+
+The parser shares the leaves of a program: one Num, Real or Str node per
+value and one Var per name (at its first use), referenced from every
+place they appear. Nothing changes a leaf after parsing; the passes
+replace it in its parent instead.
+
+Types in declarations are the strings 'integer', 'real', 'boolean' and
+'string', or an ArrayType. Every expression has a type. The literals
+(Num, Real, Str) have the type of their class and Var that of its
+Symbol, so these leaves, most of the nodes of a program, store no type
+of their own. The other expressions (TypedExpression) have a type slot.
+Var and ArrayAccess have a symbol slot, as do Assign and For. The type
+slots and the symbols are filled in by semantic.annotate_types.
+"""
+import trampoline
+
+
+class Node:
+    __slots__ = ()
+
+    def __repr__(self):
+        return trampoline.run(self.fields_repr())
+
+    def fields_repr(self):
+        fields = []
+        for name in type(self).__slots__:
+            # A posição não entra: o repr compara expressões (optimizer)
+            if name != 'lexpos':
+                fields.append((yield _value_repr(getattr(self, name))))
+        return f"{type(self).__name__}({', '.join(fields)})"
+
+    def children(self):
+        """Child nodes, in source order."""
+        for name in type(self).__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Node):
+                yield value
+            elif isinstance(value, list):
+                yield from (item for item in value if isinstance(item, Node))
+
+
+def _value_repr(value):
+    if isinstance(value, Node):
+        return value.fields_repr()
+    if isinstance(value, list):
+        return _list_repr(value)
+    return repr(value)
+
+
+def _list_repr(items):
+    parts = []
+    for item in items:
+        parts.append((yield _value_repr(item)))
+    return f"[{', '.join(parts)}]"
+
+
+#########################
+# Program and declarations
+#########################
+class Program(Node):
+    __slots__ = ('name', 'block', 'lexpos')
+
+    def __init__(self, name, block, lexpos=0):
+        self.name = name
+        self.block = block
+        self.lexpos = lexpos
+
+
+class Block(Node):
+    """Declarations (a list of VarDecl) and the main compound statement."""
+
+    __slots__ = ('declarations', 'body', 'lexpos')
+
+    def __init__(self, declarations, body, lexpos=0):
+        self.declarations = declarations
+        self.body = body
+        self.lexpos = lexpos
+
+
+class VarDecl(Node):
+    """names share one type; positions holds the lexpos of each name."""
+
+    __slots__ = ('names', 'type', 'positions', 'lexpos')
+
+    def __init__(self, names, type, lexpos=0, positions=None):
+        self.names = names
+        self.type = type
+        self.lexpos = lexpos
+        self.positions = positions if positions is not None else [lexpos] * len(names)
+
+
+class ArrayType(Node):
+    __slots__ = ('low', 'high', 'elem', 'lexpos')
+
+    def __init__(self, low, high, elem, lexpos=0):
+        self.low = low
+        self.high = high
+        self.elem = elem
+        self.lexpos = lexpos
+
+    @property
+    def size(self):
+        return self.high - self.low + 1
+
+
+#########################
+# Statements
+#########################
+class Assign(Node):
+    __slots__ = ('name', 'exp', 'symbol', 'lexpos')
+
+    def __init__(self, name, exp, lexpos=0):
+        self.name = name
+        self.exp = exp
+        self.symbol = None
+        self.lexpos = lexpos
+
+
+class Write(Node):
+    """write(args) or, with newline, writeln(args) (args may be empty)."""
+
+    __slots__ = ('args', 'newline', 'lexpos')
+
+    def __init__(self, args, newline, lexpos=0):
+        self.args = args
+        self.newline = newline
+        self.lexpos = lexpos
+
+
+class ReadLn(Node):
+    """readln into target, a Var or an ArrayAccess."""
+
+    __slots__ = ('target', 'lexpos')
+
+    def __init__(self, target, lexpos=0):
+        self.target = target
+        self.lexpos = lexpos
+
+
+class If(Node):
+    __slots__ = ('condition', 'then_block', 'else_block', 'lexpos')
+
+    def __init__(self, condition, then_block, else_block=None, lexpos=0):
+        self.condition = condition
+        self.then_block = then_block
+        self.else_block = else_block
+        self.lexpos = lexpos
+
+
+class While(Node):
+    __slots__ = ('condition', 'body', 'lexpos')
+
+    def __init__(self, condition, body, lexpos=0):
+        self.condition = condition
+        self.body = body
+        self.lexpos = lexpos
+
+
+class For(Node):
+    """for var := start to stop do body."""
+
+    __slots__ = ('var', 'start', 'stop', 'body', 'symbol', 'lexpos')
+
+    def __init__(self, var, start, stop, body, lexpos=0):
+        self.var = var
+        self.start = start
+        self.stop = stop
+        self.body = body
+        self.symbol = None
+        self.lexpos = lexpos
+
+
+class Compound(Node):
+    __slots__ = ('statements', 'lexpos')
+
+    def __init__(self, statements, lexpos=0):
+        self.statements = statements
+        self.lexpos = lexpos
+
+
+#########################
+# Expressions
+#########################
+class Expression(Node):
+    __slots__ = ()
+
+
+class TypedExpression(Expression):
+    """An expression whose type is computed by the annotation and kept in the node."""
+
+    __slots__ = ('type',)
+
+
+class Num(Expression):
+    """Integer constant (true and false are 1 and 0)."""
+
+    __slots__ = ('value',)
+    type = 'integer'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Real(Expression):
+    __slots__ = ('value',)
+    type = 'real'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Str(Expression):
+    __slots__ = ('value',)
+    type = 'string'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Var(Expression):
+    __slots__ = ('name', 'symbol', 'lexpos')
+
+    def __init__(self, name, lexpos=0):
+        self.name = name
+        self.lexpos = lexpos
+        self.symbol = None
+
+    @property
+    def type(self):
+        # Um nome não declarado (já reportado) conta como inteiro
+        return self.symbol.type if self.symbol else 'integer'
+
+
+class ArrayAccess(TypedExpression):
+    """A[index]; in_bounds is set by ranges.RangeAnalyzer when the index is
+    proven to be within the bounds of A."""
+
+    __slots__ = ('name', 'index', 'symbol', 'in_bounds', 'lexpos')
+
+    def __init__(self, name, index, lexpos=0):
+        self.name = name
+        self.index = index
+        self.lexpos = lexpos
+        self.symbol = None
+        self.type = None
+        self.in_bounds = False
+
+
+class BinOp(TypedExpression):
+    """Arithmetic (+ - * / %) or logical (and, or) operation."""
+
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.type = None
+
+
+class Compare(TypedExpression):
+    """Relational operation (= <> < <= > >=)."""
+
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.type = None
+
+
+class UnaryOp(TypedExpression):
+    """Negation ('-') or logical not ('not')."""
+
+    __slots__ = ('op', 'operand')
+
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+        self.type = None
+
+
+class Formatted(Node):
+    """write argument with a field width and, for reals, decimal places."""
+
+    __slots__ = ('exp', 'width', 'decimals')
+
+    def __init__(self, exp, width, decimals=None):
+        self.exp = exp
+        self.width = width
+        self.decimals = decimals
+
+
+def walk(node):
+    """Every node of the tree under node (included), parents first."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(node.children())))
@@ -1,3 +1,9 @@
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+from bisect import bisect_right
 import ply.lex as lex
 
 # Coments { this is a comment}
@@ -138,15 +144,19 @@ def t_NUM(t):
 
 
 # Token for strings.
+# Strings and names are interned: every occurrence of the same literal or
+# identifier is one object, so the AST keeps a single copy and the symbol
+# and string-pool dictionaries compare them by identity first.
 def t_STRING(t):
     r'\'[^\']*?\''
-    t.value = t.value[1:-1]
+    t.value = sys.intern(t.value[1:-1])
     return t
 
 
 # Token for identifiers (or reserved words).
 def t_VARNAME(t):
     r"[A-Za-z][A-Za-z0-9]*"
+    t.value = sys.intern(t.value)
     t.type = reserved.get(t.value.lower(), 'VARNAME')
     return t
 
@@ -162,10 +172,115 @@ t_ignore = " \t"
 
 
 # Error handling.
+def report_error(lexer, char, lineno):
+    message = f"Caráter inválido, \" {char}\" na linha:  {lineno}"
+    # Lexers cloned for a compiler session collect their own diagnostics
+    diagnostics = getattr(lexer, 'diagnostics', None)
+    if diagnostics is None:
+        print(message)
+    else:
+        diagnostics.append(message)
+
+
 def t_error(t):
-    print("Caráter inválido, \"", t.value[0] + "\" na linha: ", t.lineno)
+    report_error(t.lexer, t.value[0], t.lineno)
     t.lexer.skip(1)
 
 
-lexer = lex.lex()
+#########################
+# Source positions
+#########################
+_NEWLINE = re.compile('\n')
+_NEWLINE_BYTES = re.compile(b'\n')
+
+
+class LineIndex:
+    """Start offset of every line of a source, for position -> line/column.
+
+    Built in one pass over the text (str, bytes or an mmap); each lookup is
+    then a bisect instead of a scan of everything before the position.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        newline = _NEWLINE if isinstance(data, str) else _NEWLINE_BYTES
+        self.starts = [0]
+        self.starts.extend(match.end() for match in newline.finditer(data))
+
+    def position(self, pos):
+        """(line, column) of pos, both counted from 1."""
+        line = bisect_right(self.starts, pos)
+        return line, pos - self.starts[line - 1] + 1
+
+
+def line_index(lexer):
+    """LineIndex of the lexer's current input, built on first use.
+
+    It is kept on the lexer, so the lexer and the parser actions of one
+    compilation share it; a new input gets a new index.
+    """
+    index = getattr(lexer, 'line_index', None)
+    if index is None or index.data is not lexer.lexdata:
+        index = lexer.line_index = LineIndex(lexer.lexdata)
+    return index
+
+
+#########################
+# Table cache
+#########################
+# Prebuilt lexer and parser tables are kept in CACHE_DIR (PASCAL_CACHE_DIR
+# overrides it). Lexer tables are named after a signature of the rules, so
+# editing a regex regenerates them; PLY checks the parser tables itself.
+CACHE_DIR = os.environ.get('PASCAL_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+
+def _lexer_signature():
+    module = sys.modules[__name__]
+    rules = [(name, getattr(module, name).__doc__) for name in sorted(dir(module))
+             if name.startswith('t_') and callable(getattr(module, name))]
+    data = repr((rules, tokens, literals, t_ignore, lex.__version__))
+    return hashlib.sha1(data.encode()).hexdigest()[:12]
+
+
+def _load_table(name):
+    path = os.path.join(CACHE_DIR, name + '.py')
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(name, path)
+    table = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(table)
+    except Exception:
+        return None
+    return table
+
+
+def build_lexer():
+    """Build the PLY lexer, loading its tables from the cache when up to date."""
+    name = 'pascal_lextab_' + _lexer_signature()
+    table = _load_table(name)
+    if table is not None:
+        try:
+            return lex.lex(module=sys.modules[__name__], optimize=1, lextab=table)
+        except Exception:
+            pass
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        stale = [old for old in os.listdir(CACHE_DIR)
+                 if old.startswith('pascal_lextab_') and old != name + '.py']
+    except OSError:
+        stale = []
+    # Tables with another signature are no longer valid
+    for old in stale:
+        try:
+            os.remove(os.path.join(CACHE_DIR, old))
+        except OSError:
+            pass
+    return lex.lex(module=sys.modules[__name__], optimize=1, lextab=name, outputdir=CACHE_DIR,
+                   errorlog=lex.NullLogger())
+
+
+lexer = build_lexer()
 lexer.lineno = 1
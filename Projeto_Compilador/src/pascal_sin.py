@@ -1,9 +1,31 @@
-import sys
+import copy
+import os
 import ply.yacc as yacc
-from pascal_lex import tokens, literals, lexer, precedence
-
-dic = {}
+from pascal_ast import (
+    ArrayAccess, ArrayType, Assign, BinOp, Block, Compare, Compound, For, Formatted, If, Num,
+    Program, ReadLn, Real, Str, UnaryOp, Var, VarDecl, While, Write,
+)
+from pascal_lex import tokens, literals, lexer, precedence, line_index, CACHE_DIR
+
+# State of the module-level parser. Every parser returned by new_parser()
+# carries its own copies of these as attributes (p.parser.warnings, ...).
+# Names are resolved after parsing, by semantic.annotate_types.
 syntax_errors = []
+warnings = []
+# Leaves of the program being parsed, by (class, value) (see leaf())
+leaves = {}
+
+
+def leaf(p, node_class, value, lexpos=None):
+    """The node_class node of value in this parse, shared by all its uses.
+
+    A literal has no position; a Var keeps that of the first use of the name.
+    """
+    node = p.parser.leaves.get((node_class, value))
+    if node is None:
+        node = node_class(value) if lexpos is None else node_class(value, lexpos)
+        p.parser.leaves[node_class, value] = node
+    return node
 
 
 #######################
@@ -11,7 +33,7 @@ syntax_errors = []
 #######################
 def p_Program(p):
     "Program : PROGRAM VARNAME ';' Code '.'"
-    p[0] = ('program', p[2], p[4])
+    p[0] = Program(p[2], p[4], p.lexpos(1))
 
 
 ####################
@@ -19,19 +41,19 @@ def p_Program(p):
 ####################
 def p_Code(p):
     "Code : Declarations CompoundStatement"
-    p[0] = ('code', p[1], p[2])
+    p[0] = Block(p[1], p[2], p[2].lexpos)
 
 
 # Allow empty declarations
 def p_Declarations_empty(p):
     "Declarations :"
-    p[0] = None
+    p[0] = []
 
 
 # Variable declarations: e.g., VAR a, b : INTEGER;
 def p_Declarations_var(p):
     "Declarations : VAR VariableList"
-    p[0] = ('var_decls', p[2])
+    p[0] = p[2]
 
 
 def p_VariableList_single(p):
@@ -41,38 +63,28 @@ def p_VariableList_single(p):
 
 def p_VariableList_multiple(p):
     "VariableList : VariableList VariableDeclaration"
-    p[0] = p[1] + [p[2]]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_VariableDeclaration(p):
     "VariableDeclaration : IdentifierList ':' DataType ';'"
-    for var in p[1]:
-        if p[3] == "integer":
-            dic[var] = (0, "integer")
-        if p[3] == "boolean":
-            dic[var] = ('true', "boolean")
-        if p[3] == "string":
-            dic[var] = ('', "string")
-        if p[3] == "real":
-            dic[var] = (0.0, "real")
-        elif isinstance(p[3], tuple) and p[3][0] == 'array':
-            low, high = p[3][1]
-            size = high - low + 1
-            # print(var)
-            dic[var] = ([0] * size, p[3])
-        else:
-            dic[var] = (None, p[3])
-    p[0] = ('decl', p[1], p[3])
+    names, positions = p[1]
+    p[0] = VarDecl(names, p[3], p.lexpos(2), positions)
 
 
 def p_IdentifierList_single(p):
     "IdentifierList : VARNAME"
-    p[0] = [p[1]]
+    # Nomes e as posições de cada um, para os erros de declaração
+    p[0] = ([p[1]], [p.lexpos(1)])
 
 
 def p_IdentifierList_multiple(p):
     "IdentifierList : IdentifierList ',' VARNAME"
-    p[0] = p[1] + [p[3]]
+    names, positions = p[1]
+    names.append(p[3])
+    positions.append(p.lexpos(3))
+    p[0] = p[1]
 
 
 def p_DataType_integer(p):
@@ -97,7 +109,7 @@ def p_DataType_string(p):
 
 def p_DataType_array(p):
     "DataType : ARRAY '[' NUM '.' '.' NUM ']' OF DataType"
-    p[0] = ('array', (p[3], p[6]), p[9])
+    p[0] = ArrayType(p[3], p[6], p[9], p.lexpos(1))
 
 
 #########################
@@ -114,7 +126,7 @@ def p_Statement(p):
 # A matched statement is either a complete if-then-else or any non-if statement.
 def p_MatchedStatement_if(p):
     "MatchedStatement : IF Exp THEN MatchedStatement ELSE MatchedStatement"
-    p[0] = ('if', p[2], ('then', p[4]), ('else', p[6]))
+    p[0] = If(p[2], p[4], p[6], p.lexpos(1))
 
 
 def p_MatchedStatement_nonif(p):
@@ -134,13 +146,13 @@ def p_NonIfStatement(p):
 # ...or an if where the else-part leads to an unmatched statement.
 def p_UnmatchedStatement_ifelse(p):
     "UnmatchedStatement : IF Exp THEN MatchedStatement ELSE UnmatchedStatement"
-    p[0] = ('if', p[2], ('then', p[4]), ('else', p[6]))
+    p[0] = If(p[2], p[4], p[6], p.lexpos(1))
 
 
 # An unmatched statement is an if without an else...
 def p_UnmatchedStatement_if(p):
     "UnmatchedStatement : IF Exp THEN Statement"
-    p[0] = ('if', p[2], ('then', p[4]), None)
+    p[0] = If(p[2], p[4], None, p.lexpos(1))
 
 
 #########################
@@ -149,7 +161,7 @@ def p_UnmatchedStatement_if(p):
 # Modified to allow an optional semicolon after END.
 def p_CompoundStatement(p):
     "CompoundStatement : BEGIN StatementList END OptionalSemicolon"
-    p[0] = ('compound', p[2])
+    p[0] = Compound(p[2], p.lexpos(1))
 
 
 def p_StatementList_single(p):
@@ -159,78 +171,48 @@ def p_StatementList_single(p):
 
 def p_StatementList_multiple(p):
     "StatementList : StatementList Statement"
-    p[0] = p[1] + [p[2]]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_RepetitiveStatement_for(p):
     "RepetitiveStatement : FOR VARNAME ATRIB Exp TO Exp DO Statement"
-    p[0] = ('for', p[2], p[4], p[6], p[8])
+    p[0] = For(p[2], p[4], p[6], p[8], p.lexpos(1))
 
 
 def p_RepetitiveStatement_while(p):
     "RepetitiveStatement : WHILE Exp DO Statement"
-    p[0] = ('while', p[2], p[4])
+    p[0] = While(p[2], p[4], p.lexpos(1))
 
 
 def p_SingleStatement_assign(p):
     "SingleStatement : VARNAME ATRIB Exp OptionalSemicolon"
-    if p[1] in dic:
-        var_type = dic[p[1]][1]
-        dic[p[1]] = (p[3], var_type)
-    else:
-        print(f"Error: variable {p[1]} not declared")
-        dic[p[1]] = (p[3], None)
-    p[0] = ('assign', p[1], p[3])
+    p[0] = Assign(p[1], p[3], p.lexpos(1))
 
 # Modified production: use OptionalSemicolon instead of a fixed semicolon.
 def p_SingleStatement_writeln(p):
     "SingleStatement : WRITELN '(' ArgumentList ')' OptionalSemicolon"
-    p[0] = ('writeln', p[3])
-    # print("Writeln:", p[3])
+    p[0] = Write(p[3], True, p.lexpos(1))
 
 
 def p_SingleStatement_writeln2(p):
     "SingleStatement : WRITELN OptionalSemicolon"
-    p[0] = 'writeln'
-    # print("Writeln:", p[3])
+    p[0] = Write([], True, p.lexpos(1))
 
 
 def p_SingleStatement_write(p):
     "SingleStatement : WRITE '(' ArgumentList ')' OptionalSemicolon"
-    p[0] = ('write', p[3])
-    # print("Write:", p[3])
+    p[0] = Write(p[3], False, p.lexpos(1))
 
 
 def p_SingleStatement_readln(p):
     "SingleStatement : READLN '(' VARNAME ')' ';'"
-    if p[3] in dic:
-        dic[p[3]] = (0, dic[p[3]][1])
-    else:
-        dic[p[3]] = (0, None)
-    p[0] = ('readln', p[3])
+    p[0] = ReadLn(leaf(p, Var, p[3], p.lexpos(3)), p.lexpos(1))
 
 
 def p_SingleStatement_readln_array(p):
     "SingleStatement : READLN '(' VARNAME '[' Exp ']' ')' ';'"
-
-    limit = dic[p[3]][1][1]
-
-    a = limit[0]
-    b = limit[1]
-
-    if (isinstance(p[5], int)):
-        value = p[5]
-
-    elif isinstance(p[5][1], int) or isinstance(p[5][1], float):
-        value = - p[5][1]
-    else:
-        value = p[5]
-
-    if isinstance(value, int) and not value in range(a, b + 1):
-        print("Warning: range check error while evaluating constants (", value, "must be between", a, "and", b, ")")
-        parser.success = False
-
-    p[0] = ('readln_array', p[3], p[5])
+    p[0] = ReadLn(ArrayAccess(p[3], p[5], p.lexpos(3)), p.lexpos(1))
 
 
 #########################
@@ -243,12 +225,13 @@ def p_ArgumentList_single(p):
 
 def p_ArgumentList_multiple(p):
     "ArgumentList : ArgumentList ',' Argument"
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_Argument_string(p):
     "Argument : STR"
-    p[0] = p[1]
+    p[0] = leaf(p, Str, p[1])
 
 
 def p_Argument_exp(p):
@@ -258,13 +241,13 @@ def p_Argument_exp(p):
 
 def p_Argument_formatted(p):
     "Argument : Exp ':' FORMAT"
-    p[0] = ('formatted', p[1], p[3])
+    width, decimals = p[3]
+    p[0] = Formatted(p[1], width, decimals)
 
 
 def p_Format(p):
     "FORMAT : NUM"
-    print("Format:", p[1])
-    p[0] = p[1]
+    p[0] = (p[1], None)
 
 
 def p_complete_Format(p):
@@ -277,15 +260,15 @@ def p_complete_Format(p):
 #########################
 def p_Expression_relop(p):
     "Exp : SimpleExpression RelOp SimpleExpression"
-    p[0] = ('rel', p[2], p[1], p[3])
+    p[0] = Compare(p[2], p[1], p[3])
 
 def p_Expression_and(p):
     "Exp : Exp AND Exp"
-    p[0] = ('and', p[1], p[3])
+    p[0] = BinOp('and', p[1], p[3])
 
 def p_Expression_or(p):
     "Exp : Exp OR Exp"
-    p[0] = ('or', p[1], p[3])
+    p[0] = BinOp('or', p[1], p[3])
 
 
 def p_Expression_simple(p):
@@ -311,7 +294,7 @@ def p_SimpleExpression_sign(p):
 
 def p_SimpleExpression_sign_neg(p):
     "SimpleExpression : '-' AdditiveExpression %prec UMINUS"
-    p[0] = ('uminus', p[2])
+    p[0] = UnaryOp('-', p[2])
 
 
 def p_SimpleExpression(p):
@@ -321,12 +304,12 @@ def p_SimpleExpression(p):
 
 def p_AdditiveExpression_plus(p):
     "AdditiveExpression : AdditiveExpression '+' Term"
-    p[0] = ('+', p[1], p[3])
+    p[0] = BinOp('+', p[1], p[3])
 
 
 def p_AdditiveExpression_minus(p):
     "AdditiveExpression : AdditiveExpression '-' Term"
-    p[0] = ('-', p[1], p[3])
+    p[0] = BinOp('-', p[1], p[3])
 
 
 def p_AdditiveExpression_term(p):
@@ -336,17 +319,17 @@ def p_AdditiveExpression_term(p):
 
 def p_Term_mul(p):
     "Term : Term '*' Factor"
-    p[0] = ('*', p[1], p[3])
+    p[0] = BinOp('*', p[1], p[3])
 
 
 def p_Term_div(p):
     "Term : Term '/' Factor"
-    p[0] = ('/', p[1], p[3])
+    p[0] = BinOp('/', p[1], p[3])
 
 
 def p_Term_mod(p):
     "Term : Term '%' Factor"
-    p[0] = ('%', p[1], p[3])
+    p[0] = BinOp('%', p[1], p[3])
 
 
 def p_Term_factor(p):
@@ -356,31 +339,31 @@ def p_Term_factor(p):
 
 def p_Factor_num(p):
     "Factor : NUM"
-    p[0] = p[1]
+    p[0] = leaf(p, Num, p[1])
 
 
 def p_Factor_real(p):
     "Factor : NUM_REAL"
-    p[0] = p[1]
+    p[0] = leaf(p, Real, p[1])
 
 
 def p_Factor_string(p):
     "Factor : STRING"
-    p[0] = p[1]
+    p[0] = leaf(p, Str, p[1])
 
 
 def p_Factor_true(p):
     "Factor : TRUE"
-    p[0] = 1
+    p[0] = leaf(p, Num, 1)
 
 def p_Factor_false(p):
     "Factor : FALSE"
-    p[0] = 0
+    p[0] = leaf(p, Num, 0)
 
 
 def p_Factor_var(p):
     "Factor : VARNAME"
-    p[0] = ('var', p[1])
+    p[0] = leaf(p, Var, p[1], p.lexpos(1))
 
 
 def p_Factor_paren(p):
@@ -391,29 +374,12 @@ def p_Factor_paren(p):
 # array_access access_array
 def p_Factor_array(p):
     "Factor : VARNAME '[' Exp ']'"
-    limit = dic[p[1]][1][1]
-
-    a = limit[0]
-    b = limit[1]
-
-    if isinstance(p[3], int):
-        value = p[3]
-
-    elif isinstance(p[3][1], int) or isinstance(p[3][1], float):
-        value = - p[3][1]
-    else:
-        value = p[3]
-
-    if isinstance(value, int) and not value in range(a, b + 1):
-        print("Warning: range check error while evaluating constants (", value, "must be between", a, "and", b, ")")
-        parser.success = False
-
-    p[0] = ('array_access', p[1], p[3])
+    p[0] = ArrayAccess(p[1], p[3], p.lexpos(1))
 
 
 def p_Factor_not(p):
     "Factor : NOT Factor %prec NOT"
-    p[0] = ('not', p[2])
+    p[0] = UnaryOp('not', p[2])
 
 
 #########################
@@ -433,36 +399,43 @@ def p_empty(p):
 #########################
 # Error Handling
 #########################
-def find_column(input, token):
-    last_newline = input.rfind('\n', 0, token.lexpos)
-    if last_newline < 0:
-        last_newline = -1
-    return token.lexpos - last_newline
-
-
-def p_error(p):
+def report_syntax_error(parser, p):
     if p:
-        line = p.lexer.lexdata[:p.lexpos].count('\n') + 1
-        col = find_column(p.lexer.lexdata, p)
-        syntax_errors.append(
+        line, col = line_index(p.lexer).position(p.lexpos)
+        parser.syntax_errors.append(
             f"Syntax error at line {line}, column {col}: unexpected token '{p.value}'"
         )
     else:
-        syntax_errors.append("Syntax error: unexpected end of input!")
+        parser.syntax_errors.append("Syntax error: unexpected end of input!")
 
 
-lexer.lineno = 1
-parser = yacc.yacc()
+def p_error(p):
+    report_syntax_error(parser, p)
 
-#########################
-# Main entry point: Parse input code (Debug)
-#########################
-code = open("../tests/SomaArray.pas", "r").read()
-
-parser.success = True
-ast = parser.parse(code, lexer=lexer)
-# if parser.success:
-# print("AST:", ast)
-# print("Let's GO!!!")
-# else:
-# print("Try again!")
+
+lexer.lineno = 1
+# PLY compares the grammar signature with the pickled tables and only
+# regenerates them (and rewrites the pickle) when the grammar changed.
+try:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+except OSError:
+    pass
+parser = yacc.yacc(debug=False, write_tables=False,
+                   picklefile=os.path.join(CACHE_DIR, 'pascal_parsetab.pickle'))
+parser.syntax_errors = syntax_errors
+parser.warnings = warnings
+parser.leaves = leaves
+
+
+def new_parser():
+    """Return an independent parser that shares the LALR tables with `parser`.
+
+    The copy has its own parse stacks and diagnostics, so several of them
+    can run at the same time (one per thread).
+    """
+    session_parser = copy.copy(parser)
+    session_parser.syntax_errors = []
+    session_parser.warnings = []
+    session_parser.leaves = {}
+    session_parser.errorfunc = lambda tok: report_syntax_error(session_parser, tok)
+    return session_parser
@@ -0,0 +1,139 @@
+# peephole.py
+"""Peephole optimizer over the ir.Code produced by the translator.
+
+Each rule looks at the last few instructions of the output (a window
+ending at the instruction just added) and may replace them. Rules are
+applied again to their own result, and whole passes repeat until one
+changes nothing. Jumps only land on labels, so a window without a label
+inside can always be rewritten on its own.
+"""
+
+from ir import Code, Op
+
+_FOLD = {
+    Op.ADD: lambda a, b: a + b,
+    Op.SUB: lambda a, b: a - b,
+    Op.MUL: lambda a, b: a * b,
+}
+
+
+def is_label(instr):
+    return instr[0] == Op.LABEL
+
+
+def int_push(instr):
+    """Value pushed by a PUSHI, or None."""
+    return instr[1] if instr[0] == Op.PUSHI else None
+
+
+#########################
+# Rules: window -> replacement (None when the rule does not apply)
+#########################
+def fold_constants(window):
+    """PUSHI a; PUSHI b; ADD|SUB|MUL -> PUSHI (a op b) (e.g. constant index - 1, -1 * k)."""
+    a, b, (op, _) = int_push(window[0]), int_push(window[1]), window[2]
+    if a is None or b is None or op not in _FOLD:
+        return None
+    return [(Op.PUSHI, _FOLD[op](a, b))]
+
+
+def identity(window):
+    """PUSHI 0; ADD|SUB and PUSHI 1; MUL|DIV leave the value below unchanged."""
+    value, (op, _) = int_push(window[0]), window[1]
+    if (value == 0 and op in (Op.ADD, Op.SUB)) or (value == 1 and op in (Op.MUL, Op.DIV)):
+        return []
+    return None
+
+
+def store_load(window):
+    """STOREG n; PUSHG n -> DUP 1; STOREG n (no reload of what was just stored)."""
+    (op1, arg1), (op2, arg2) = window
+    if op1 == Op.STOREG and op2 == Op.PUSHG and arg1 == arg2:
+        return [(Op.DUP, 1), (Op.STOREG, arg1)]
+    return None
+
+
+def constant_branch(window):
+    """PUSHI c; JZ L -> JUMP L when c is 0, nothing otherwise."""
+    value, (op, label) = int_push(window[0]), window[1]
+    if value is None or op != Op.JZ:
+        return None
+    return [(Op.JUMP, label)] if value == 0 else []
+
+
+def jump_to_next(window):
+    """JUMP L; L: -> L:"""
+    (op, label), next_instr = window
+    if op == Op.JUMP and next_instr == (Op.LABEL, label):
+        return [next_instr]
+    return None
+
+
+def dead_code(window):
+    """Nothing after a JUMP is reached before the next label."""
+    (op, _), next_instr = window
+    if op == Op.JUMP and not is_label(next_instr):
+        return [window[0]]
+    return None
+
+
+# name -> (window size, rule), in the order they are tried
+RULES = {
+    'fold_constants': (3, fold_constants),
+    'identity': (2, identity),
+    'store_load': (2, store_load),
+    'constant_branch': (2, constant_branch),
+    'jump_to_next': (2, jump_to_next),
+    'dead_code': (2, dead_code),
+}
+
+
+def validate_rules(names):
+    """Raise ValueError if any of names is not in RULES."""
+    unknown = [name for name in names if name not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown peephole rules: {', '.join(unknown)}")
+
+
+class PeepholeOptimizer:
+    """Applies the chosen RULES (all by default) and counts the hits of each."""
+
+    def __init__(self, rules=None):
+        names = list(RULES) if rules is None else list(rules)
+        validate_rules(names)
+        self.rules = [(name,) + RULES[name] for name in names]
+        self.hits = dict.fromkeys(names, 0)
+        self.passes = 0
+
+    def optimize(self, code):
+        """Return an optimized copy of an ir.Code."""
+        instrs = list(code)
+        while True:
+            self.passes += 1
+            instrs, changed = self._pass(instrs)
+            if not changed:
+                break
+        return Code(instrs)
+
+    def _pass(self, instrs):
+        out = []
+        changed = False
+        for instr in instrs:
+            out.append(instr)
+            # Reescreve o fim da saída enquanto alguma regra se aplicar
+            matched = True
+            while matched:
+                matched = False
+                for name, size, rule in self.rules:
+                    if len(out) < size:
+                        continue
+                    window = out[-size:]
+                    if any(is_label(i) for i in window[:-1]):
+                        continue
+                    replacement = rule(window)
+                    if replacement is not None:
+                        out[-size:] = replacement
+                        self.hits[name] += 1
+                        changed = matched = True
+                        break
+        return out, changed
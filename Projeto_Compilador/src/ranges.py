@@ -0,0 +1,208 @@
+# ranges.py
+"""Interval analysis of integer variables, to prove array indices in bounds.
+
+RangeAnalyzer goes through the statements in order keeping, for each
+integer variable, an interval (low, high) holding every value it can have
+at that point (-inf/inf when unbounded). Declared variables start at 0,
+assignments give a variable the interval of their expression, readln
+forgets it and the two branches of an if are joined. A loop forgets the
+variables its body stores into and its body is analysed once from that
+state, which holds at the start of every iteration; inside a for loop the
+counter is also known to be between the bounds. Every ArrayAccess whose
+index interval lies within the bounds of the array gets in_bounds = True,
+and its runtime check can be left out. Like the translators, the analysis
+is a set of generators run by trampoline.run.
+"""
+import math
+
+import trampoline
+
+from pascal_ast import (
+    ArrayAccess, ArrayType, Assign, BinOp, Compound, Formatted, For, If, Num, ReadLn, UnaryOp, Var,
+    While, Write, walk,
+)
+from semantic import analyze_loops
+
+TOP = (-math.inf, math.inf)
+
+
+def _mul(a, b):
+    # 0 * inf é 0: os valores são inteiros, nunca infinitos
+    return 0 if a == 0 or b == 0 else a * b
+
+
+def _div(a, k):
+    # Divisão inteira da VM (trunca para zero); os infinitos ficam como estão
+    return a if math.isinf(a) else int(a / k)
+
+
+def join(env1, env2):
+    """Intervals holding the values of both environments."""
+    return {name: (min(iv[0], env2[name][0]), max(iv[1], env2[name][1]))
+            for name, iv in env1.items() if name in env2}
+
+
+class RangeAnalyzer:
+    """Marks the array accesses of a Program proven to be in bounds.
+
+    loops is the semantic.analyze_loops summary of the program, for the
+    variables each loop stores into. accesses counts the array accesses
+    seen, proven those marked.
+    """
+
+    def __init__(self, loops):
+        self.env = {}
+        self.loops = loops
+        # Variáveis a que o ciclo atual deu um intervalo (sem contar os ciclos
+        # de dentro, que esquecem as suas ao sair)
+        self.written = set()
+        self.accesses = 0
+        self.proven = 0
+        self.statement_map = {
+            Assign: self.analyze_assignment,
+            Write: self.analyze_write,
+            ReadLn: self.analyze_readln,
+            If: self.analyze_if,
+            While: self.analyze_while,
+            For: self.analyze_for,
+            Compound: self.analyze_compound,
+        }
+        self.expression_map = {
+            Num: self.interval_of_constant,
+            Var: self.interval_of_variable,
+            BinOp: self.interval_of_binary_op,
+            UnaryOp: self.interval_of_unary_op,
+        }
+
+    def analyze_program(self, program):
+        # As variáveis declaradas começam a 0 (ver Translator.translate_declarations)
+        for decl in program.block.declarations:
+            if decl.type == 'integer':
+                for name in decl.names:
+                    self.env[name] = (0, 0)
+        trampoline.run(self.analyze(program.block.body))
+
+    #########################
+    # Statements
+    #########################
+    def analyze(self, stmt):
+        analyzer = self.statement_map.get(type(stmt))
+        return analyzer(stmt) if analyzer else None
+
+    def analyze_assignment(self, stmt):
+        yield self.mark(stmt.exp)
+        self.env[stmt.name] = yield self.interval(stmt.exp)
+        self.written.add(stmt.name)
+
+    def analyze_write(self, stmt):
+        for arg in stmt.args:
+            yield self.mark(arg.exp if isinstance(arg, Formatted) else arg)
+
+    def analyze_readln(self, stmt):
+        if isinstance(stmt.target, Var):
+            self.env[stmt.target.name] = TOP
+        else:
+            yield self.mark(stmt.target)
+
+    def analyze_if(self, stmt):
+        yield self.mark(stmt.condition)
+        before = dict(self.env)
+        yield self.analyze(stmt.then_block)
+        after_then = self.env
+        self.env = before
+        yield self.analyze(stmt.else_block)
+        self.env = join(after_then, self.env)
+
+    def forget(self, names):
+        for name in names:
+            self.env[name] = TOP
+
+    def analyze_while(self, stmt):
+        # Só as variáveis com valor antes do ciclo podem ter um intervalo a esquecer
+        self.forget(self.loops[stmt].live_in)
+        outer, self.written = self.written, set()
+        yield self.mark(stmt.condition)
+        yield self.analyze(stmt.body)
+        self.forget(self.written)
+        self.written = outer
+
+    def analyze_for(self, stmt):
+        yield self.mark(stmt.start)
+        yield self.mark(stmt.stop)
+        start = yield self.interval(stmt.start)
+        stop = yield self.interval(stmt.stop)
+        loop = self.loops[stmt]
+        self.forget(loop.live_in)
+        outer, self.written = self.written, {stmt.var}
+        # O contador fica entre os limites enquanto o corpo não lhe mexer
+        self.env[stmt.var] = TOP if loop.stores_into(stmt.var) else (start[0], stop[1])
+        yield self.analyze(stmt.body)
+        self.forget(self.written)
+        self.written = outer
+
+    def analyze_compound(self, stmt):
+        for sub_stmt in stmt.statements:
+            yield self.analyze(sub_stmt)
+
+    #########################
+    # Expressions
+    #########################
+    def mark(self, exp):
+        """Mark the array accesses in exp whose index is in bounds."""
+        for node in walk(exp):
+            if isinstance(node, ArrayAccess):
+                self.accesses += 1
+                array_type = node.symbol.type if node.symbol else None
+                if isinstance(array_type, ArrayType):
+                    low, high = yield self.interval(node.index)
+                    if array_type.low <= low and high <= array_type.high:
+                        node.in_bounds = True
+                        self.proven += 1
+
+    def interval(self, exp):
+        """Interval of the values of an integer expression (TOP if unknown)."""
+        interval_of = self.expression_map.get(type(exp))
+        if interval_of is None or exp.type != 'integer':
+            return TOP
+        return interval_of(exp)
+
+    def interval_of_constant(self, exp):
+        return (exp.value, exp.value)
+
+    def interval_of_variable(self, exp):
+        return self.env.get(exp.name, TOP)
+
+    def interval_of_unary_op(self, exp):
+        low, high = yield self.interval(exp.operand)
+        return (-high, -low)
+
+    def interval_of_binary_op(self, exp):
+        a, b = yield self.interval(exp.left)
+        c, d = yield self.interval(exp.right)
+        op = exp.op
+        if op == '+':
+            return (a + c, b + d)
+        if op == '-':
+            return (a - d, b - c)
+        if op == '*':
+            products = (_mul(a, c), _mul(a, d), _mul(b, c), _mul(b, d))
+            return (min(products), max(products))
+        if op in ('/', '%') and c == d and c > 0:
+            # Só com divisor constante positivo
+            if op == '/':
+                return (_div(a, c), _div(b, c))
+            if a >= 0:
+                return (0, min(b, c - 1))
+            return (-(c - 1), c - 1)
+        return TOP
+
+
+def analyze_ranges(program, loops=None):
+    """Run RangeAnalyzer over an annotated Program and return it (for its counters).
+
+    loops is semantic.analyze_loops(program), computed here when not given."""
+    if loops is None:
+        loops = analyze_loops(program)
+    analyzer = RangeAnalyzer(loops)
+    analyzer.analyze_program(program)
+    return analyzer
@@ -0,0 +1,271 @@
+# semantic.py
+"""Name binding and type annotation of the AST, done once before translation.
+
+Every name is resolved to one Symbol per variable: Var, ArrayAccess,
+Assign and For nodes get it in their symbol slot (None when the name is
+not declared), so the translator reads the address straight from it.
+Every other expression (a pascal_ast.TypedExpression) gets its type
+('integer', 'real', 'string', 'boolean' or an ArrayType) in its type
+slot; literals have the type of their class and a Var that of its
+Symbol. Children are annotated
+before their parents, so the type of a node is computed from those
+already stored below it; the walk runs on trampoline.run, so its depth is
+not limited by the Python stack.
+
+Undeclared and duplicate names, and constant array indices out of
+bounds, are collected in TypeAnnotator.errors for the whole program
+instead of stopping at the first one. An undeclared name is reported
+once, at its first use: its Var nodes are one shared node (see
+pascal_ast).
+"""
+import trampoline
+
+from pascal_ast import (
+    ArrayAccess, ArrayType, Assign, BinOp, Compare, Expression, For, Num, ReadLn, UnaryOp,
+    Var, VarDecl, While,
+)
+
+NO_STORES = frozenset()
+
+
+class Symbol:
+    """A variable: declared, or the counter of a for loop that was not.
+
+    address (the global slot) and layout (of an array) are filled in by
+    the translator when it allocates the variable.
+    """
+
+    __slots__ = ('name', 'type', 'lexpos', 'address', 'layout')
+
+    def __init__(self, name, type, lexpos=0):
+        self.name = name
+        self.type = type
+        self.lexpos = lexpos
+        self.address = None
+        self.layout = None
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.type!r})"
+
+
+class TypeAnnotator:
+    """Fills in the symbol and type slots of a Program.
+
+    symbols maps each name to its Symbol, in the order they were declared
+    (the implicit for counters after the var section, in program order);
+    errors holds (lexpos, message) for every error found.
+    """
+
+    def __init__(self):
+        self.symbols = {}
+        self.errors = []
+        self.undeclared = set()
+        self.binding_map = {
+            Assign: self.bind_assignment,
+            For: self.bind_for,
+        }
+        # Os literais têm o tipo da sua classe: não há nada a anotar
+        self.annotation_map = {
+            Var: self.annotate_variable_ref,
+            ArrayAccess: self.annotate_array_access,
+            BinOp: self.annotate_binary_op,
+            UnaryOp: self.annotate_unary_op,
+            Compare: self.annotate_relational_op,
+        }
+
+    def declare(self, declarations):
+        """Symbols of the var section (the first declaration of a name wins)."""
+        for decl in declarations:
+            for name, lexpos in zip(decl.names, decl.positions):
+                if name in self.symbols:
+                    self.errors.append((lexpos, f"variable '{name}' already declared"))
+                else:
+                    self.symbols[name] = Symbol(name, decl.type, lexpos)
+
+    def annotate_program(self, program):
+        self.declare(program.block.declarations)
+        trampoline.run(self.annotate_statement(program.block.body))
+
+    def lookup(self, name, lexpos):
+        """Symbol of name, or None when it is not declared (an error, reported
+        at the first use of the name only)."""
+        symbol = self.symbols.get(name)
+        if symbol is None and name not in self.undeclared:
+            self.undeclared.add(name)
+            self.errors.append((lexpos, f"variable '{name}' not declared"))
+        return symbol
+
+    #########################
+    # Statements
+    #########################
+    def bind_assignment(self, stmt):
+        stmt.symbol = self.lookup(stmt.name, stmt.lexpos)
+
+    def bind_for(self, stmt):
+        # Contador não declarado: uma variável inteira implícita
+        if stmt.var not in self.symbols:
+            self.symbols[stmt.var] = Symbol(stmt.var, 'integer', stmt.lexpos)
+        stmt.symbol = self.symbols[stmt.var]
+
+    def annotate_statement(self, node):
+        binder = self.binding_map.get(type(node))
+        if binder:
+            binder(node)
+        for child in node.children():
+            if isinstance(child, Expression):
+                yield self.annotate(child)
+            else:
+                yield self.annotate_statement(child)
+
+    #########################
+    # Expressions
+    #########################
+    def annotate_variable_ref(self, exp):
+        # O tipo de um Var é o do seu Symbol
+        exp.symbol = self.lookup(exp.name, exp.lexpos)
+
+    def annotate_array_access(self, exp):
+        yield self.annotate(exp.index)
+        symbol = exp.symbol = self.lookup(exp.name, exp.lexpos)
+        # O tipo é o dos elementos, não o do array inteiro
+        exp.type = getattr(symbol.type, 'elem', None) if symbol else None
+        if symbol and isinstance(symbol.type, ArrayType):
+            self.check_constant_index(exp, symbol.type)
+
+    def check_constant_index(self, exp, array_type):
+        """Report a constant index out of the bounds of the array."""
+        index = exp.index
+        if isinstance(index, Num):
+            value = index.value
+        elif isinstance(index, UnaryOp) and index.op == '-' and isinstance(index.operand, Num):
+            value = -index.operand.value
+        else:
+            return
+        a, b = array_type.low, array_type.high
+        if not a <= value <= b:
+            self.errors.append((exp.lexpos, "range check error while evaluating constants"
+                                            f" ( {value} must be between {a} and {b} )"))
+
+    def annotate_binary_op(self, exp):
+        yield self.annotate(exp.left)
+        yield self.annotate(exp.right)
+        if exp.op in ('and', 'or'):
+            exp.type = 'boolean'
+        elif 'real' in (exp.left.type, exp.right.type):
+            exp.type = 'real'
+        else:
+            exp.type = 'integer'
+
+    def annotate_unary_op(self, exp):
+        yield self.annotate(exp.operand)
+        if exp.op == 'not':
+            exp.type = 'boolean'
+        else:
+            exp.type = 'real' if exp.operand.type == 'real' else 'integer'
+
+    def annotate_relational_op(self, exp):
+        yield self.annotate(exp.left)
+        yield self.annotate(exp.right)
+        exp.type = 'boolean'
+
+    def annotate(self, exp):
+        annotator = self.annotation_map.get(type(exp))
+        return annotator(exp) if annotator else None
+
+
+def annotate_types(program):
+    """Annotate a pascal_ast.Program in place; returns the TypeAnnotator (for its errors)."""
+    annotator = TypeAnnotator()
+    annotator.annotate_program(program)
+    return annotator
+
+
+class LoopInfo:
+    """What the body of a while or for loop stores into (see analyze_loops).
+
+    The nodes of the body are numbered first..last in pre-order, so size
+    is their number. live_in holds the variables the body stores into that
+    already had a value before the loop (declared, or stored into before
+    it in the program).
+    """
+
+    __slots__ = ('live_in', 'first', 'last', 'size', 'first_stores')
+
+    def __init__(self, live_in, first, last, first_stores):
+        self.live_in = live_in
+        self.first = first
+        self.last = last
+        self.size = last - first + 1
+        # nome -> número do nó que primeiro lhe dá valor (partilhado por todos)
+        self.first_stores = first_stores
+
+    def stores_into(self, name):
+        """True when the body may store into the simple variable name."""
+        # Ou já tinha valor antes do ciclo, ou o primeiro valor é dado no corpo
+        return name in self.live_in or self.first <= self.first_stores.get(name, -1) <= self.last
+
+
+def analyze_loops(program):
+    """LoopInfo of every while and for loop of a Program, keyed by the loop node.
+
+    A body stores into a variable through assignments, readln into the
+    variable and the counters of for loops (readln into an array element
+    is not a store to a simple variable). The nodes are numbered in one
+    pass, in pre-order, noting where each variable is first given a value
+    (its declaration counts); the live_in sets are built bottom-up from
+    those of the children. A variable first stored into inside the body is
+    found from its number, so live_in stays small however deep loops nest,
+    and nested loops are not walked again for each loop around them.
+    """
+    loops = {}
+    first_stores = {}
+    # live_in de cada nó terminado e o seu número, até o pai os recolher
+    done = {}
+    position = 0
+    stack = [(program, None, 0)]
+    while stack:
+        current, children, first = stack.pop()
+        node_type = type(current)
+        if children is None:
+            # Primeira visita: numera o nó e anota onde cada nome recebe valor
+            stored = stored_name(current)
+            if stored is not None:
+                first_stores.setdefault(stored, position)
+            elif node_type is VarDecl:
+                for name in current.names:
+                    first_stores.setdefault(name, position)
+            children = list(current.children())
+            stack.append((current, children, position))
+            position += 1
+            stack.extend((child, None, 0) for child in reversed(children))
+            continue
+        live_in = NO_STORES
+        if node_type is While or node_type is For:
+            # O corpo é o último filho: acaba no último nó numerado
+            body_live_in, body_first = done.pop(current.body, (NO_STORES, position))
+            live_in = frozenset(name for name in body_live_in if first_stores[name] < body_first)
+            loops[current] = LoopInfo(live_in, body_first, position - 1, first_stores)
+        for child in children:
+            # (o corpo de um ciclo já foi recolhido acima)
+            if child in done:
+                child_live_in, _ = done.pop(child)
+                # o mesmo conjunto é partilhado enquanto só um filho escreve
+                if child_live_in:
+                    live_in = live_in | child_live_in if live_in else child_live_in
+        stored = stored_name(current)
+        if stored is not None:
+            live_in = live_in | {stored}
+        done[current] = (live_in, first)
+    return loops
+
+
+def stored_name(node):
+    """The simple variable a statement stores into itself (not in its children), or None."""
+    node_type = type(node)
+    if node_type is Assign:
+        return node.name
+    if node_type is ReadLn and type(node.target) is Var:
+        return node.target.name
+    if node_type is For:
+        return node.var
+    return None
@@ -0,0 +1,190 @@
+# server.py
+"""Compile server: keeps the front end loaded and answers JSON-lines requests.
+
+Each request is one JSON object per line:
+
+    {"id": 1, "source": "program p; begin writeln('ola') end."}
+    {"id": 2, "cmd": "stats"}
+
+and each answer is one JSON object per line:
+
+    {"id": 1, "ok": true, "vm_code": "PUSHS ...", "errors": [], "warnings": [], "ms": 0.8}
+
+Run it over stdin/stdout (default) or on a Unix socket:
+
+    python server.py
+    python server.py --socket /tmp/pascal.sock --workers 4 --timeout 5
+"""
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from compiler import LEXERS, OPT_LEVELS, CompilerSession
+
+
+class LatencyStats:
+    """Request counters and latencies of the most recent requests."""
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def record(self, ms, ok, timed_out=False):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(ms)
+            if not ok:
+                self.failures += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                'requests': self.requests,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+            }
+        if latencies:
+            stats.update({
+                'mean_ms': round(sum(latencies) / len(latencies), 3),
+                'p50_ms': round(latencies[len(latencies) // 2], 3),
+                'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                'max_ms': round(latencies[-1], 3),
+            })
+        return stats
+
+
+class CompileServer:
+    """Bounded pool of compiler sessions shared by every client."""
+
+    def __init__(self, workers=None, timeout=10.0, lexer_backend='ply', opt_level=0):
+        self.lexer_backend = lexer_backend
+        self.opt_level = opt_level
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        # No more requests waiting than twice the pool size
+        self.slots = threading.BoundedSemaphore(self.workers * 2)
+        self.local = threading.local()
+        self.stats = LatencyStats()
+
+    def _compile(self, source):
+        # One session per worker thread, created on first use
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = CompilerSession(lexer_backend=self.lexer_backend,
+                                                           opt_level=self.opt_level)
+        return session.compile(source)
+
+    def handle(self, request):
+        """Answer one decoded request."""
+        if request.get('cmd') == 'stats':
+            return {'id': request.get('id'), 'ok': True, 'stats': self.stats.snapshot()}
+        if request.get('cmd') == 'ping':
+            return {'id': request.get('id'), 'ok': True}
+
+        source = request.get('source')
+        if not isinstance(source, str):
+            return {'id': request.get('id'), 'ok': False, 'errors': ["Request has no 'source'"]}
+
+        start = time.perf_counter()
+        with self.slots:
+            future = self.pool.submit(self._compile, source)
+            try:
+                result = future.result(timeout=self.timeout)
+            except TimeoutError:
+                # The worker cannot be interrupted; its result is discarded
+                ms = (time.perf_counter() - start) * 1000
+                self.stats.record(ms, False, timed_out=True)
+                return {'id': request.get('id'), 'ok': False,
+                        'errors': [f"Timed out after {self.timeout}s"], 'ms': round(ms, 3)}
+        ms = (time.perf_counter() - start) * 1000
+        self.stats.record(ms, result.success)
+        return {
+            'id': request.get('id'),
+            'ok': result.success,
+            'vm_code': "\n".join(result.vm_code) if result.success else None,
+            'errors': result.errors,
+            'warnings': result.warnings,
+            'ms': round(ms, 3),
+        }
+
+    def handle_line(self, line):
+        """Answer one JSON line, returning the encoded answer."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return json.dumps({'id': None, 'ok': False, 'errors': [f"Invalid request: {e}"]})
+        return json.dumps(self.handle(request), ensure_ascii=False)
+
+    def serve_stdio(self, stdin=sys.stdin, stdout=sys.stdout):
+        for line in stdin:
+            if not line.strip():
+                continue
+            stdout.write(self.handle_line(line) + "\n")
+            stdout.flush()
+
+    def serve_unix(self, path):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    answer = server.handle_line(line.decode('utf-8'))
+                    self.wfile.write(answer.encode('utf-8') + b"\n")
+                    self.wfile.flush()
+
+        if os.path.exists(path):
+            os.remove(path)
+        with socketserver.ThreadingUnixStreamServer(path, Handler) as unix_server:
+            unix_server.daemon_threads = True
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.remove(path)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Pascal compile server (JSON lines).")
+    arg_parser.add_argument("--socket", help="listen on this Unix socket instead of stdin/stdout")
+    arg_parser.add_argument("--workers", type=int, help="compile threads (default: min(4, CPUs))")
+    arg_parser.add_argument("--timeout", type=float, default=10.0, help="seconds per request")
+    arg_parser.add_argument("--lexer", choices=sorted(LEXERS), default="ply", help="lexer backend")
+    arg_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=0,
+                            help="optimization level")
+    args = arg_parser.parse_args()
+
+    server = CompileServer(workers=args.workers, timeout=args.timeout, lexer_backend=args.lexer,
+                           opt_level=args.opt_level)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.socket:
+            server.serve_unix(args.socket)
+        else:
+            server.serve_stdio()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
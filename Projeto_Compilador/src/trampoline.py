@@ -0,0 +1,39 @@
+# trampoline.py
+"""Run recursive tree walks on an explicit stack instead of the Python stack.
+
+A recursive method is written as a generator that, instead of calling
+itself on a child, yields the call and gets its result back:
+
+    def translate_binary_op(self, exp):
+        yield self.translate(exp.left)
+        yield self.translate(exp.right)
+        self.code.emit(...)
+
+run() keeps the suspended generators in a list, so the depth of the tree
+is limited only by memory (a 100000-term a1 + a2 + ... is 100000 levels
+deep). A yielded value that is not a generator, such as the result of a
+method that needed no recursion, is sent straight back.
+"""
+from types import GeneratorType
+
+
+def run(call):
+    """Result of call (a generator, or an already computed value)."""
+    if not isinstance(call, GeneratorType):
+        return call
+    stack = [call]
+    value = None
+    while True:
+        try:
+            call = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            value = stop.value
+            continue
+        if isinstance(call, GeneratorType):
+            stack.append(call)
+            value = None
+        else:
+            value = call
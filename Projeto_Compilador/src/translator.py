@@ -1,35 +1,173 @@
 # translator.py
+"""AST to ir.Code.
+
+The translate methods are generators run by trampoline.run: a
+translation of a child node is yielded instead of called, so deeply
+nested expressions and statements do not use the Python stack.
+"""
+import trampoline
+from ir import Code, Op
+from ranges import analyze_ranges
+from semantic import Symbol, analyze_loops, annotate_types
+from pascal_ast import (
+    ArrayAccess, ArrayType, Assign, BinOp, Compare, Compound, For, Formatted, If, Num, ReadLn,
+    Real, Str, UnaryOp, Var, While, Write,
+)
+
+# Desenrolamento de ciclos for (ver StatementTranslator.translate_for)
+UNROLL_BUDGET = 64
+UNROLL_FACTOR = 4
+
+# Operador com o resultado contrário (para saltar quando a comparação é verdadeira)
+NEGATED = {'=': '<>', '<>': '=', '<': '>=', '<=': '>', '>': '<=', '>=': '<'}
+
+# Tabelas de opcodes, construídas uma só vez
+ARITHMETIC_OPS = {
+    '+': Op.ADD,
+    '-': Op.SUB,
+    '*': Op.MUL,
+    '/': Op.DIV,
+    '%': Op.MOD,
+    'and': Op.AND,
+    'or': Op.OR,
+}
+RELATIONAL_OPS = {
+    '=': (Op.EQUAL,),
+    '<>': (Op.EQUAL, Op.NOT),
+    '<': (Op.INF,),
+    '<=': (Op.INFEQ,),
+    '>': (Op.SUP,),
+    '>=': (Op.SUPEQ,),
+}
+# Negativo unário: multiplica por -1; NOT lógico sobre 0/1
+UNARY_OPS = {
+    '-': ((Op.PUSHI, -1), (Op.MUL,)),
+    'not': ((Op.NOT,),),
+}
+# Escrita por tipo (booleanos como 0/1; o resto como inteiro)
+WRITE_OPS = {'integer': Op.WRITEI, 'real': Op.WRITEF, 'string': Op.WRITES, 'boolean': Op.WRITEI}
+# Conversão da string lida por READ (strings ficam como estão)
+READ_CONVERSIONS = {'integer': Op.ATOI, 'real': Op.ATOF, 'boolean': Op.ATOI}
+# Valor inicial das variáveis simples
+INITIAL_VALUES = {
+    'integer': (Op.PUSHI, 0),
+    'real': (Op.PUSHF, 0.0),
+    'string': (Op.PUSHS, ""),
+    'boolean': (Op.PUSHI, 0),
+}
+
+
+def for_bound_slot(level):
+    """Name of the hidden global holding the bound of the for loops nested level deep."""
+    # '#' não pode aparecer num identificador Pascal
+    return f"#for{level}"
+
+
+def bound_is_invariant(stmt, loops):
+    """True when the bound of a for loop can be read at every test instead of once:
+    a constant, or a variable the loop does not change (loops: semantic.analyze_loops)."""
+    stop = stmt.stop
+    if isinstance(stop, Num):
+        return True
+    return isinstance(stop, Var) and stop.name != stmt.var and not loops[stmt].stores_into(stop.name)
+
+
+def constant_trip_count(stmt, loops):
+    """Iterations of a for loop with constant bounds whose body does not store
+    into the counter (0 when it never runs), or None (loops: semantic.analyze_loops)."""
+    if not (isinstance(stmt.start, Num) and isinstance(stmt.stop, Num)):
+        return None
+    if loops[stmt].stores_into(stmt.var):
+        return None
+    return max(stmt.stop.value - stmt.start.value + 1, 0)
+
+
+def bound_slots_needed(node, loops):
+    """Greatest nesting of for loops whose bound needs a hidden global."""
+    deepest = 0
+    stack = [(node, 0)]
+    while stack:
+        node, level = stack.pop()
+        # Só as instruções podem conter ciclos: as expressões não são visitadas
+        node_type = type(node)
+        if node_type is For:
+            if not bound_is_invariant(node, loops):
+                level += 1
+                deepest = max(deepest, level)
+            stack.append((node.body, level))
+        elif node_type is While:
+            stack.append((node.body, level))
+        elif node_type is If:
+            stack.append((node.then_block, level))
+            if node.else_block:
+                stack.append((node.else_block, level))
+        elif node_type is Compound:
+            stack.extend((stmt, level) for stmt in node.statements)
+    return deepest
+
+
+def pooled_strings(body):
+    """String literals given a slot of the pool, in order of first use: those
+    used more than once, or inside a loop (where each PUSHS would make a new
+    copy at every iteration)."""
+    uses = {}
+    stack = [(body, False)]
+    while stack:
+        node, in_loop = stack.pop()
+        if type(node) is Str:
+            uses[node.value] = uses.get(node.value, 0) + (2 if in_loop else 1)
+        in_loop = in_loop or type(node) in (While, For)
+        stack.extend((child, in_loop) for child in reversed(list(node.children())))
+    return [value for value, count in uses.items() if count > 1]
+
+
+class ArrayLayout:
+    """Place of the elements of an array in its heap block (row-major).
+
+    bounds holds (low, high) per dimension. strides[d] is the distance
+    between consecutive indices of dimension d, and origin the offset the
+    element with every index 0 would have, so the offset of an element is
+    sum(index[d] * strides[d]) - origin: all the lower bounds cost a single
+    subtraction, and a constant index none at all.
+    """
+
+    __slots__ = ('bounds', 'strides', 'origin', 'size')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        strides = []
+        stride = 1
+        for low, high in reversed(self.bounds):
+            strides.append(stride)
+            stride *= high - low + 1
+        self.strides = tuple(reversed(strides))
+        self.size = stride
+        self.origin = sum(low * stride for (low, _), stride in zip(self.bounds, self.strides))
+
+    def offset(self, indices):
+        """Offset of the element at constant indices."""
+        return sum(index * stride for index, stride in zip(indices, self.strides)) - self.origin
+
 
 class SymbolTable:
-    """Manages variable tracking and memory allocation."""
+    """Allocates the global slots of the variables (semantic.Symbol)."""
 
     def __init__(self):
-        self.variables = {}
+        self.variables = {}  # nome -> Symbol já alocado
         self.global_var_counter = 0
 
-    def allocate_var(self, var_name, var_type):
-        """Allocate a new variable and return its address."""
-        if var_name in self.variables:
-            return self.variables[var_name]['address']
-
-        address = self.global_var_counter
-
-        # For arrays, allocate additional space
-        if isinstance(var_type, tuple) and var_type[0] == 'array':
-            self.global_var_counter += 1
-        else:
-            # For simple types (integer, real, string, boolean), increment by 1
-            self.global_var_counter += 1
-
-        self.variables[var_name] = {
-            'address': address,
-            'type': var_type
-        }
-        return address
+    def allocate(self, symbol):
+        """Give symbol the next global slot (once) and return its address."""
+        if symbol.address is not None:
+            return symbol.address
 
-    def get_var_info(self, var_name):
-        """Retrieve variable information."""
-        return self.variables.get(var_name)
+        # Um slot por variável; um array guarda o endereço do seu bloco da heap
+        symbol.address = self.global_var_counter
+        self.global_var_counter += 1
+        if isinstance(symbol.type, ArrayType):
+            symbol.layout = ArrayLayout([(symbol.type.low, symbol.type.high)])
+        self.variables[symbol.name] = symbol
+        return symbol.address
 
 
 class LabelGenerator:
@@ -47,552 +185,580 @@ class LabelGenerator:
 class ExpressionTranslator:
     """Translates expressions to VM operations."""
 
-    def __init__(self, symbol_table, vm_code):
+    def __init__(self, symbol_table, code, check_bounds=False):
         self.symbol_table = symbol_table
-        self.vm_code = vm_code
+        self.code = code
+        self.check_bounds = check_bounds
+        self.checks = 0  # CHECK emitidos
+        self.checks_elided = 0  # acessos provados dentro dos limites
+        # Contadores de ciclos desenrolados: nome -> (endereço ou None, deslocamento)
+        self.index_values = {}
+        # Pool de strings: literal -> endereço do global que a guarda
+        self.string_pool = {}
+        self.translation_map = {
+            Num: self.translate_numeric_constant,
+            Real: self.translate_real_constant,
+            Str: self.translate_string_constant,
+            Var: self.translate_variable_ref,
+            ArrayAccess: self.translate_array_access,
+            BinOp: self.translate_binary_op,
+            UnaryOp: self.translate_unary_op,
+            Compare: self.translate_relational_op,
+        }
 
-    def translate_numeric_constant(self, value):
-        """Translate numeric constant (integer)."""
-        self.vm_code.append(f"PUSHI {value}")
+    def translate_numeric_constant(self, exp):
+        """Translate numeric constant (integer, true or false)."""
+        self.code.emit(Op.PUSHI, exp.value)
 
-    def translate_string_constant(self, value):
-        """Translate string constant."""
-        # Uso de aspas para literal de string
-        self.vm_code.append(f"PUSHS \"{value}\"")
+    def translate_string_constant(self, exp):
+        """Translate string constant (read from its pool slot, if it has one)."""
+        address = self.string_pool.get(exp.value)
+        if address is not None:
+            self.code.emit(Op.PUSHG, address)
+        else:
+            # Uso de aspas para literal de string
+            self.code.emit(Op.PUSHS, exp.value)
 
-    def translate_real_constant(self, value):
+    def translate_real_constant(self, exp):
         """Translate real (float) constant."""
-        self.vm_code.append(f"PUSHF {value}")
+        self.code.emit(Op.PUSHF, exp.value)
 
-    def translate_variable_ref(self, var_name):
+    def translate_variable_ref(self, exp):
         """Translate variable reference."""
-        var_info = self.symbol_table.get_var_info(var_name)
-        if not var_info:
-            raise ValueError(f"Undefined variable: {var_name}")
-        self.vm_code.append(f"PUSHG {var_info['address']}")
-
-    def translate_array_access(self, array_name, index_exp):
-        """Translate array access (A[i])."""
-        var_info = self.symbol_table.get_var_info(array_name)
-        if not var_info:
-            raise ValueError(f"Undefined array: {array_name}")
+        if exp.name in self.index_values:
+            # Contador de um ciclo desenrolado: constante, ou contador + deslocamento
+            address, offset = self.index_values[exp.name]
+            if address is None:
+                self.code.emit(Op.PUSHI, offset)
+            else:
+                self.code.emit(Op.PUSHG, address)
+                if offset:
+                    self.code.emit(Op.PUSHI, offset)
+                    self.code.emit(Op.ADD)
+            return
+        if exp.symbol is None:
+            raise ValueError(f"Undefined variable: {exp.name}")
+        self.code.emit(Op.PUSHG, exp.symbol.address)
+
+    def constant_value(self, exp):
+        """Value of an integer expression known at compile time, or None."""
+        if isinstance(exp, Num):
+            return exp.value
+        if isinstance(exp, UnaryOp) and exp.op == '-' and isinstance(exp.operand, Num):
+            return -exp.operand.value
+        if isinstance(exp, Var) and exp.name in self.index_values:
+            # Contador de um ciclo desenrolado por completo
+            address, offset = self.index_values[exp.name]
+            if address is None:
+                return offset
+        return None
+
+    def translate_element_address(self, access):
+        """Push the heap block of an array and the offset of A[i] (an ArrayAccess) in it.
+
+        When the index is a constant the offset is not pushed but returned
+        (for LOAD/STORE); otherwise None is returned (for LOADN/STOREN).
+        With check_bounds, an index not proven in bounds (access.in_bounds)
+        is checked at run time with CHECK.
+        """
+        symbol = access.symbol
+        if symbol is None or symbol.layout is None:
+            raise ValueError(f"Undefined array: {access.name}")
+        layout = symbol.layout
+        (low, high), = layout.bounds
 
         # Empurra base address do array
-        self.vm_code.append(f"PUSHG {var_info['address']}")
-
-        # Se o índice for algo como ('var', X) ou número literal:
-        if isinstance(index_exp, tuple) and index_exp[0] == 'var':
-            _, var = index_exp
-            var_add = self.symbol_table.variables.get(var)['address']
+        self.code.emit(Op.PUSHG, symbol.address)
+
+        index = self.constant_value(access.index)
+        if index is not None and (low <= index <= high or not self.check_bounds):
+            # Deslocamento calculado já na compilação
+            if self.check_bounds:
+                self.checks_elided += 1
+            return layout.offset([index])
+
+        yield self.translate(access.index)
+        if self.check_bounds:
+            if access.in_bounds:
+                self.checks_elided += 1
+            else:
+                self.code.emit(Op.CHECK, (low, high))
+                self.checks += 1
+        (stride,) = layout.strides
+        if stride != 1:
+            self.code.emit(Op.PUSHI, stride)
+            self.code.emit(Op.MUL)
+        if layout.origin:
+            # Corrige o índice pelo limite inferior declarado
+            self.code.emit(Op.PUSHI, layout.origin)
+            self.code.emit(Op.SUB)
+        return None
+
+    def translate_array_access(self, exp):
+        """Translate array access (A[i])."""
+        offset = yield self.translate_element_address(exp)
+        # Carrega o valor em memória
+        if offset is None:
+            self.code.emit(Op.LOADN)
         else:
-            var_add = index_exp
-
-        self.vm_code.append(f"PUSHG {var_add}")
-        self.vm_code.append("PUSHI 1")
-        self.vm_code.append("SUB")  # corrigir índice (Pascal é 1‐based)
+            self.code.emit(Op.LOAD, offset)
 
-        # Carrega o valor em memória
-        self.vm_code.append("LOADN")
-
-    def translate_arithmetic_op(self, op, left_exp, right_exp):
-        """Translate arithmetic operations (+, -, *, /, %)."""
-        op_map = {
-            '+': 'ADD',
-            '-': 'SUB',
-            '*': 'MUL',
-            '/': 'DIV',
-            '%': 'MOD'
-        }
+    def translate_binary_op(self, exp):
+        """Translate arithmetic (+, -, *, /, %) and logical (and, or) operations."""
         # Empurra operandos na pilha
-        self.translate(left_exp)
-        self.translate(right_exp)
+        yield self.translate(exp.left)
+        yield self.translate(exp.right)
         # Aplica o opcode correspondente
-        self.vm_code.append(op_map[op])
-
-    def translate_unary_op(self, op, exp):
-        """Translate unary operations (uminus, not)."""
-        if op == 'uminus':
-            # Negativo unário: evala exp e multiplica por −1
-            self.translate(exp)
-            self.vm_code.append("PUSHI -1")
-            self.vm_code.append("MUL")
-        elif op == 'not':
-            # NOT lógico: evala exp (que deve empurrar 0/1) e aplica NOT
-            self.translate(exp)
-            self.vm_code.append("NOT")
-
-    def translate_relational_op(self, op, left_exp, right_exp):
-        """Translate relational operations (=, <>, <, <=, >, >=)."""
-        op_map = {
-            '=': 'EQUAL',
-            '<>': 'EQUAL NOT',
-            '<': 'INF',
-            '<=': 'INFEQ',
-            '>': 'SUP',
-            '>=': 'SUPEQ'
-        }
+        self.code.emit(ARITHMETIC_OPS[exp.op])
+
+    def translate_unary_op(self, exp):
+        """Translate unary operations (-, not)."""
+        instructions = UNARY_OPS.get(exp.op)
+        if instructions:
+            # Avalia exp e aplica o operador
+            yield self.translate(exp.operand)
+            for instruction in instructions:
+                self.code.emit(*instruction)
+
+    def translate_relational_op(self, exp, negate=False):
+        """Translate relational operations (=, <>, <, <=, >, >=); negate pushes the opposite result."""
         # Empurra operandos
-        self.translate(left_exp)
-        self.translate(right_exp)
+        yield self.translate(exp.left)
+        yield self.translate(exp.right)
         # Emite o opcode do comparador
-        if op not in op_map:
-            raise ValueError(f"Unsupported relational operator: {op}")
-        self.vm_code.append(op_map[op])
+        if exp.op not in RELATIONAL_OPS:
+            raise ValueError(f"Unsupported relational operator: {exp.op}")
+        for op in RELATIONAL_OPS[NEGATED[exp.op] if negate else exp.op]:
+            self.code.emit(op)
 
     def translate(self, exp):
-        """Main expression translation dispatch."""
+        """Main expression translation dispatch (a generator, or None for a leaf already emitted)."""
         if exp is None:
-            return
-
-        # **1. Literais numéricos e reais**
-        if isinstance(exp, float):
-            self.translate_real_constant(exp)
-            return
-        if isinstance(exp, int):
-            self.translate_numeric_constant(exp)
-            return
-
-        # **2. Literais booleanos** (True/False → PUSHI 1 ou PUSHI 0)
-        if isinstance(exp, bool):
-            val = 1 if exp else 0
-            self.vm_code.append(f"PUSHI {val}")
-            return
-
-        # **3. Strings ou nomes de variáveis**
-        if isinstance(exp, str):
-            if exp in self.symbol_table.variables:
-                self.translate_variable_ref(exp)
-            else:
-                # Se não for variável conhecida, assumimos que é literal de string
-                self.translate_string_constant(exp)
-            return
-
-        # Se não é uma tupla neste ponto, é algo inválido
-        if not isinstance(exp, tuple):
-            raise ValueError(f"Unsupported expression type: {exp}")
+            return None
 
-        # **4. Se for tupla, extrai operador e argumentos**
-        op = exp[0]
-
-        if op == 'var':
-            # Referência a variável
-            self.translate_variable_ref(exp[1])
-
-        elif op == 'array_access':
-            # Acesso a array
-            self.translate_array_access(exp[1], exp[2])
-
-        elif op in ['+', '-', '*', '/', '%']:
-            # Operador aritmético binário
-            self.translate_arithmetic_op(op, exp[1], exp[2])
-
-        elif op in ['uminus', 'not']:
-            # Operador unário
-            self.translate_unary_op(op, exp[1])
-
-        elif op == 'rel':
-            # Relacional: exp = ('rel', operador, esquerda, direita)
-            self.translate_relational_op(exp[1], exp[2], exp[3])
-
-        elif op == 'and':
-            # AND lógico – avalia esquerda e direita, então emite AND
-            self.translate(exp[1])
-            self.translate(exp[2])
-            self.vm_code.append("AND")
-            return
-
-        elif op == 'or':
-            # OR lógico – avalia esquerda e direita, então emite OR
-            self.translate(exp[1])
-            self.translate(exp[2])
-            self.vm_code.append("OR")
-            return
-
-        else:
+        translator = self.translation_map.get(type(exp))
+        if translator is None:
             raise ValueError(f"Unsupported expression node: {exp}")
+        return translator(exp)
 
 
 class StatementTranslator:
     """Translates statements to VM operations."""
 
-    def __init__(self, symbol_table, vm_code, label_gen, expr_translator):
+    def __init__(self, symbol_table, code, label_gen, expr_translator, short_circuit=True,
+                 rotate_loops=False, unroll_budget=0, unroll_factor=UNROLL_FACTOR):
         self.symbol_table = symbol_table
-        self.vm_code = vm_code
+        self.code = code
         self.label_gen = label_gen
         self.expr_translator = expr_translator
+        self.short_circuit = short_circuit
+        self.rotate_loops = rotate_loops
+        self.unroll_budget = unroll_budget
+        self.unroll_factor = unroll_factor
+        self.for_level = 0  # for loops (com limite escondido) em que estamos
+        self.loops = {}  # semantic.analyze_loops do corpo
+        self.translation_map = {
+            Assign: self.translate_assignment,
+            Write: self.translate_write,
+            ReadLn: self.translate_readln,
+            If: self.translate_if,
+            While: self.translate_while,
+            For: self.translate_for,
+            Compound: self.translate_compound
+        }
 
     def translate_assignment(self, stmt):
         """Translate assignment statement."""
-        # stmt = ('assign', var_name, exp)
-        var_name, exp = stmt[1], stmt[2]
         # Avalia o lado direito primeiro
-        self.expr_translator.translate(exp)
+        yield self.expr_translator.translate(stmt.exp)
         # Armazena no endereço da variável
-        var_info = self.symbol_table.get_var_info(var_name)
-        self.vm_code.append(f"STOREG {var_info['address']}")
-
-    def translate_writeln(self, stmt):
-        """Translate writeln (imprime e quebra linha)."""
-        # stmt = ('writeln', lista_de_argumentos)
-        if isinstance(stmt, tuple):
-            self.translate_write(stmt)
-        self.vm_code.append("WRITELN")
+        if stmt.symbol is None:
+            raise ValueError(f"Undefined variable: {stmt.name}")
+        self.code.emit(Op.STOREG, stmt.symbol.address)
 
     def translate_write(self, stmt):
-        """Translate write (sem quebra de linha)."""
-        # stmt = ('write', [arg1, arg2, ...])
-        for arg in stmt[1]:
-            format_info = None
-            actual_arg = arg
-
-            # Se houver formatação (tipo: ('formatted', exp, formato)):
-            if isinstance(arg, tuple) and len(arg) >= 2 and arg[0] == 'formatted':
-                actual_arg = arg[1]
-                if len(arg) >= 3:
-                    format_info = arg[2]
+        """Translate write and writeln (que quebra a linha no fim)."""
+        for arg in stmt.args:
+            # Formatação (largura, casas decimais) ainda não implementada: ignora
+            actual_arg = arg.exp if isinstance(arg, Formatted) else arg
 
             # Traduz o próprio valor
-            self.expr_translator.translate(actual_arg)
-
-            # Se tiver format_info, ainda não implementamos lógica de padding/width
-            # (ignorar por enquanto)
-            # ...
-
-            # Descobre o tipo do argumento (para escolher WRITEI/WRITEF/WRITES)
-            var_type = self.get_expression_type(arg)
-
-            if var_type == 'integer':
-                self.vm_code.append("WRITEI")
-            elif var_type == 'real':
-                self.vm_code.append("WRITEF")
-            elif var_type == 'string':
-                self.vm_code.append("WRITES")
-            elif var_type == 'boolean':
-                # Imprime booleano como inteiro (0 ou 1)
-                self.vm_code.append("WRITEI")
-            else:
-                # Default: imprimir como inteiro
-                self.vm_code.append("WRITEI")
-
-    def get_expression_type(self, expr):
-        """Determina o tipo de uma expressão AST (integer, real, string ou boolean)."""
-        # 1) Se for literal booleano
-        if isinstance(expr, bool):
-            return 'boolean'
-
-        # 2) Se for tupla (nodo da AST)
-        if isinstance(expr, tuple):
-            op = expr[0]
-            # and, or, not → sempre boolean
-            if op in ['and', 'or', 'not']:
-                return 'boolean'
-            # rela­cionais: eq/ne/lt/le/gt/ge
-            if op == 'rel':
-                return 'boolean'
-            # aritméticos
-            if op in ['+', '-', '*', '/', '%', 'uminus']:
-                left_t = self.get_expression_type(expr[1])
-                right_t = self.get_expression_type(expr[2]) if len(expr) > 2 else None
-                if left_t == 'real' or right_t == 'real':
-                    return 'real'
-                return 'integer'
-            # array_access
-            if op == 'array_access':
-                # tipo do array: var_info['type'] é algo como ('array', (low, high), base_type)
-                var_name = expr[1]
-                var_info = self.symbol_table.get_var_info(var_name)
-                # o tipo final do array_access é o tipo dos elementos, não do array inteiro
-                _, _, elem_type = var_info['type']
-                return elem_type
-            # literal numérico encapsulado
-            if op == 'num':
-                if isinstance(expr[1], float):
-                    return 'real'
-                return 'integer'
-            # literal string encapsulado
-            if op == 'string':
-                return 'string'
-            # caso 'var' (referência a variável)
-            if op == 'var':
-                var_info = self.symbol_table.variables.get(expr[1])
-                return var_info['type'] if var_info else 'integer'
-
-        # 3) Se for string “simples” → ou literal de string (com caracteres não alfanuméricos)
-        if isinstance(expr, str):
-            # Verifica se é uma variável conhecida
-            var = self.symbol_table.variables.get(expr)
-            if var:
-                return var['type']
-            # Caso contrário, se for literal de string (contém aspas, espaços ou pontuação)
-            if ' ' in expr or any(c in expr for c in '.,!?;:()[]{}'):
-                return 'string'
-            # Senão, assume identificador de inteiro
-            return 'integer'
-
-        # 4) Se for número “puro” (Nunca cai aqui, porque já foi capturado por isinstance(int/float)?)
-        return 'integer'  # fallback
+            yield self.expr_translator.translate(actual_arg)
+
+            # Tipo anotado pela análise semântica (para escolher WRITEI/WRITEF/WRITES);
+            # argumentos formatados são impressos como inteiros
+            var_type = 'integer' if isinstance(arg, Formatted) else arg.type
+            self.code.emit(WRITE_OPS.get(var_type, Op.WRITEI))
+
+        if stmt.newline:
+            self.code.emit(Op.WRITELN)
 
     def translate_readln(self, stmt):
-        """Translate readln para variáveis simples."""
-        # stmt = ('readln', var_name)
-        var_name = stmt[1]
-        var_info = self.symbol_table.get_var_info(var_name)
+        """Translate readln para variáveis simples ou elementos de array."""
+        target = stmt.target
+        if isinstance(target, ArrayAccess):
+            yield self.translate_readln_array(target)
+            return
+
+        symbol = target.symbol
+        if symbol is None:
+            raise ValueError(f"Undefined variable: {target.name}")
 
         # Gerar READ
-        self.vm_code.append("READ")
+        self.code.emit(Op.READ)
 
         # Converter string lida para tipo correto
-        var_type = var_info['type']
-        if var_type == 'integer':
-            self.vm_code.append("ATOI")
-        elif var_type == 'real':
-            self.vm_code.append("ATOF")
-        elif var_type == 'boolean':
-            self.vm_code.append("ATOI")
+        conversion = READ_CONVERSIONS.get(symbol.type)
+        if conversion:
+            self.code.emit(conversion)
 
         # Armazenar em var
-        self.vm_code.append(f"STOREG {var_info['address']}")
+        self.code.emit(Op.STOREG, symbol.address)
 
-    def translate_readln_array(self, stmt):
+    def translate_readln_array(self, target):
         """Translate readln para elemento de array."""
-        # stmt = ('readln_array', array_name, index_exp)
-        array_name = stmt[1]
-        index_exp = stmt[2]
-
-        if array_name not in self.symbol_table.variables:
-            raise ValueError(f"Undefined array: {array_name}")
-
-        array_info = self.symbol_table.get_var_info(array_name)
-        # Endereço base do array
-        self.vm_code.append(f"PUSHG {array_info['address']}")
-
-        # Índice (semelhante ao translate_array_access)
-        if isinstance(index_exp, tuple) and index_exp[0] == 'var':
-            _, var = index_exp
-            var_add = self.symbol_table.variables.get(var)['address']
-        else:
-            var_add = index_exp
-
-        self.vm_code.append(f"PUSHG {var_add}")
-        self.vm_code.append("PUSHI 1")
-        self.vm_code.append("SUB")
+        # Endereço base do array e índice (como no acesso a array)
+        offset = yield self.expr_translator.translate_element_address(target)
 
         # Faz leitura em array[index]
-        self.vm_code.append("READ")
+        self.code.emit(Op.READ)
 
         # Converte de string para tipo dos elementos
-        _, _, elem_type = array_info['type']
-        if elem_type == 'integer':
-            self.vm_code.append("ATOI")
-        elif elem_type == 'real':
-            self.vm_code.append("ATOF")
-        elif elem_type == 'boolean':
-            self.vm_code.append("ATOI")
+        conversion = READ_CONVERSIONS.get(target.type)
+        if conversion:
+            self.code.emit(conversion)
 
-        self.vm_code.append("STOREN")
+        if offset is None:
+            self.code.emit(Op.STOREN)
+        else:
+            self.code.emit(Op.STORE, offset)
 
     def translate_if(self, stmt):
         """Translate if statement."""
-        # stmt = ('if', condition_exp, ('then', then_block), ('else', else_block)?)
-        condition = stmt[1]
-        then_block = stmt[2][1]
-        else_block = stmt[3][1] if stmt[3] else None
+        then_block = stmt.then_block
+        else_block = stmt.else_block
 
         # Gera rótulos únicos
         false_label = self.label_gen.generate('ifFalse')
         end_label = self.label_gen.generate('ifEnd')
 
-        # Avalia condição e empurra 0/1
-        self.expr_translator.translate(condition)
-
-        # Se zero, salta para else
-        self.vm_code.append(f"JZ {false_label}")
+        # Se a condição for falsa, salta para else
+        yield self.branch(stmt.condition, false_label, False)
 
         # Then‐block
-        self.translate(then_block)
+        yield self.translate(then_block)
 
         if else_block:
             # Salta por cima do else
-            self.vm_code.append(f"JUMP {end_label}")
+            self.code.emit(Op.JUMP, end_label)
 
         # Rótulo “else” (se existir)
-        self.vm_code.append(f"{false_label}:")
+        self.code.label(false_label)
 
         if else_block:
-            self.translate(else_block)
+            yield self.translate(else_block)
             # Rótulo final
-            self.vm_code.append(f"{end_label}:")
+            self.code.label(end_label)
 
     def translate_while(self, stmt):
         """Translate while loop."""
-        # stmt = ('while', condition, body)
-        condition = stmt[1]
-        body = stmt[2]
-
         start_label = self.label_gen.generate('whileStart')
         end_label = self.label_gen.generate('whileEnd')
 
-        self.vm_code.append(f"{start_label}:")
+        if self.rotate_loops:
+            # Teste à entrada e no fim do corpo: um salto a menos por iteração
+            yield self.branch(stmt.condition, end_label, False)
+            self.code.label(start_label)
+            yield self.translate(stmt.body)
+            yield self.branch(stmt.condition, start_label, True)
+            self.code.label(end_label)
+            return
+
+        self.code.label(start_label)
 
-        # Avalia condição
-        self.expr_translator.translate(condition)
-        # Se false, sai
-        self.vm_code.append(f"JZ {end_label}")
+        # Se a condição for falsa, sai
+        yield self.branch(stmt.condition, end_label, False)
 
         # Corpo
-        self.translate(body)
+        yield self.translate(stmt.body)
         # Volta para o início
-        self.vm_code.append(f"JUMP {start_label}")
+        self.code.emit(Op.JUMP, start_label)
 
-        self.vm_code.append(f"{end_label}:")
+        self.code.label(end_label)
 
     def translate_for(self, stmt):
-        """Translate for loop."""
-        # stmt = ('for', var_name, start_exp, end_exp, body)
-        var_name = stmt[1]
-        start_exp = stmt[2]
-        end_exp = stmt[3]
-        body = stmt[4]
-
-        # Garante que a variável existe
-        if var_name not in self.symbol_table.variables:
-            self.symbol_table.allocate_var(var_name, 'integer')
-        var_info = self.symbol_table.get_var_info(var_name)
+        """Translate for loop.
+
+        With an unroll_budget, a loop with constant bounds is unrolled: fully
+        when its body, repeated once per iteration, has at most unroll_budget
+        nodes (the counter becomes a constant in each copy), otherwise by up
+        to unroll_factor copies per iteration, within the same budget.
+        """
+        # Um contador não declarado tem o seu slot no primeiro ciclo que o usa
+        counter = stmt.symbol
+        self.symbol_table.allocate(counter)
+
+        trips = constant_trip_count(stmt, self.loops) if self.unroll_budget else None
+        if trips is not None:
+            size = self.loops[stmt].size
+            if trips * size <= self.unroll_budget:
+                yield self.translate_for_unrolled(stmt, counter, trips)
+                return
+            copies = min(self.unroll_factor, self.unroll_budget // size, trips)
+            if copies >= 2:
+                yield self.translate_for_loop(stmt, counter, copies)
+                # Iterações que sobram: desenroladas por completo
+                first = stmt.start.value + trips // copies * copies
+                yield self.translate_copies(stmt, None, range(first, stmt.stop.value + 1))
+                if first <= stmt.stop.value:
+                    self.code.emit(Op.PUSHI, stmt.stop.value + 1)
+                    self.code.emit(Op.STOREG, counter.address)
+                return
+        yield self.translate_for_loop(stmt, counter)
+
+    def translate_for_unrolled(self, stmt, counter, trips):
+        """One copy of the body per iteration, then the final value of the counter."""
+        yield self.translate_copies(stmt, None, range(stmt.start.value, stmt.stop.value + 1))
+        self.code.emit(Op.PUSHI, stmt.start.value + trips)
+        self.code.emit(Op.STOREG, counter.address)
+
+    def translate_copies(self, stmt, address, offsets):
+        """The body once per offset, reading the counter as address + offset
+        (as the constant offset when address is None)."""
+        index_values = self.expr_translator.index_values
+        for offset in offsets:
+            if address is not None and offset == 0:
+                index_values.pop(stmt.var, None)
+            else:
+                index_values[stmt.var] = (address, offset)
+            yield self.translate(stmt.body)
+        index_values.pop(stmt.var, None)
+
+    def translate_for_loop(self, stmt, counter, copies=1):
+        """The loop itself, running copies iterations (copies of the body) per test."""
+        # O limite é avaliado uma só vez, antes do valor inicial (como em Pascal),
+        # para um global escondido; constantes e variáveis que o laço não altera
+        # são lidas diretamente em cada teste
+        bound = None
+        if copies == 1 and not bound_is_invariant(stmt, self.loops):
+            self.for_level += 1
+            bound = self.symbol_table.variables[for_bound_slot(self.for_level)]
+            yield self.expr_translator.translate(stmt.stop)
+            self.code.emit(Op.STOREG, bound.address)
 
         # Avalia e armazena _inicial_
-        self.expr_translator.translate(start_exp)
-        self.vm_code.append(f"STOREG {var_info['address']}")
+        yield self.expr_translator.translate(stmt.start)
+        self.code.emit(Op.STOREG, counter.address)
 
         start_label = self.label_gen.generate('forStart')
         end_label = self.label_gen.generate('forEnd')
 
-        self.vm_code.append(f"{start_label}:")
+        def push_test():
+            # Carrega var atual
+            self.code.emit(Op.PUSHG, counter.address)
+            # Limite “to” (Sempre “to” no vosso parser)
+            if copies > 1:
+                # Só entra com iterações para todas as cópias
+                self.code.emit(Op.PUSHI, stmt.stop.value - copies + 1)
+            elif bound:
+                self.code.emit(Op.PUSHG, bound.address)
+            else:
+                yield self.expr_translator.translate(stmt.stop)
+
+        if not self.rotate_loops:
+            self.code.label(start_label)
 
-        # Carrega var atual
-        self.vm_code.append(f"PUSHG {var_info['address']}")
-        # Avalia condição “to” (Sempre “to” no vosso parser)
-        self.expr_translator.translate(end_exp)
         # Se var > end, sai (usamos INFEQ = var <= end)
-        self.vm_code.append("INFEQ")
-        self.vm_code.append(f"JZ {end_label}")
+        yield push_test()
+        self.code.emit(Op.INFEQ)
+        self.code.emit(Op.JZ, end_label)
+
+        if self.rotate_loops:
+            self.code.label(start_label)
 
         # Corpo do laço
-        self.translate(body)
+        if copies == 1:
+            yield self.translate(stmt.body)
+        else:
+            yield self.translate_copies(stmt, counter.address, range(copies))
 
         # Incrementa var
-        self.vm_code.append(f"PUSHG {var_info['address']}")
-        self.vm_code.append("PUSHI 1")
-        self.vm_code.append("ADD")
-        self.vm_code.append(f"STOREG {var_info['address']}")
-
-        self.vm_code.append(f"JUMP {start_label}")
-        self.vm_code.append(f"{end_label}:")
+        self.code.emit(Op.PUSHG, counter.address)
+        self.code.emit(Op.PUSHI, copies)
+        self.code.emit(Op.ADD)
+        self.code.emit(Op.STOREG, counter.address)
+
+        if self.rotate_loops:
+            # Teste no fim: volta ao corpo enquanto var <= end (SUP = var > end)
+            yield push_test()
+            self.code.emit(Op.SUP)
+            self.code.emit(Op.JZ, start_label)
+        else:
+            self.code.emit(Op.JUMP, start_label)
+        self.code.label(end_label)
+        if bound:
+            self.for_level -= 1
+
+    def branch(self, condition, label, when):
+        """Jump to label when condition is true (when=True) or false (when=False).
+
+        and, or and not are translated into jumps (short-circuit): the right
+        operand of and/or is only evaluated when the left one does not decide.
+        """
+        if self.short_circuit and isinstance(condition, BinOp) and condition.op in ('and', 'or'):
+            if (condition.op == 'or') == when:
+                # a or b verdadeiro / a and b falso: basta um dos lados
+                yield self.branch(condition.left, label, when)
+                yield self.branch(condition.right, label, when)
+            else:
+                # a and b verdadeiro / a or b falso: o lado esquerdo pode decidir o contrário
+                skip_label = self.label_gen.generate('condSkip')
+                yield self.branch(condition.left, skip_label, not when)
+                yield self.branch(condition.right, label, when)
+                self.code.label(skip_label)
+        elif self.short_circuit and isinstance(condition, UnaryOp) and condition.op == 'not':
+            yield self.branch(condition.operand, label, not when)
+        elif isinstance(condition, Compare) and when:
+            # Salta se verdadeira: a comparação contrária é falsa
+            yield self.expr_translator.translate_relational_op(condition, negate=True)
+            self.code.emit(Op.JZ, label)
+        else:
+            # Empurra 0/1; JZ salta quando é falso
+            yield self.expr_translator.translate(condition)
+            if when:
+                self.code.emit(Op.NOT)
+            self.code.emit(Op.JZ, label)
 
     def translate_compound(self, stmt):
         """Translate compound statement (várias instruções)."""
-        # stmt = ('compound', [sub_stmt1, sub_stmt2, ...])
-        for sub_stmt in stmt[1]:
-            self.translate(sub_stmt)
+        for sub_stmt in stmt.statements:
+            yield self.translate(sub_stmt)
 
     def translate(self, stmt):
-        """Main statement dispatcher."""
-        if not isinstance(stmt, tuple):
-            # Tratamento de writeln sem argumentos (token único)
-            if stmt == 'writeln':
-                op = stmt
-            else:
-                return
-        else:
-            op = stmt[0]
-
-        translation_map = {
-            'assign': self.translate_assignment,
-            'write': self.translate_write,
-            'writeln': self.translate_writeln,
-            'readln': self.translate_readln,
-            'readln_array': self.translate_readln_array,
-            'if': self.translate_if,
-            'while': self.translate_while,
-            'for': self.translate_for,
-            'compound': self.translate_compound
-        }
+        """Main statement dispatcher (returns the generator of the translation)."""
+        if stmt is None:
+            return None
 
-        translator = translation_map.get(op)
+        translator = self.translation_map.get(type(stmt))
         if translator:
-            translator(stmt)
-        else:
-            print(f"Unsupported statement type: {op}")
+            return translator(stmt)
+        print(f"Unsupported statement type: {type(stmt).__name__}")
+        return None
 
 
 class Translator:
     """Main translator class."""
 
-    def __init__(self):
-        self.vm_code = []
+    def __init__(self, short_circuit=True, rotate_loops=False, unroll_budget=0,
+                 unroll_factor=UNROLL_FACTOR, check_bounds=False, string_pool=False):
+        self.code = Code()
         self.symbol_table = SymbolTable()
         self.label_gen = LabelGenerator()
-
-    def translate_declarations(self, declarations):
-        """Process variable declarations (empurra valor inicial e aloca)."""
-        if declarations and declarations[0] == 'var_decls':
-            for decl in declarations[1]:
-                var_names = decl[1]
-                var_type = decl[2]
-
-                for var_name in var_names:
-                    if var_type == 'integer':
-                        # inicializa inteiro com 0
-                        self.vm_code.append("PUSHI 0")
-                    elif var_type == 'real':
-                        # inicializa real com 0.0
-                        self.vm_code.append("PUSHF 0.0")
-                    elif var_type == 'string':
-                        # inicializa string vazia
-                        self.vm_code.append("PUSHS \"\"")
-                    elif var_type == 'boolean':
-                        # inicializa booleano como inteiro 0
-                        self.vm_code.append("PUSHI 0")
-                    elif isinstance(var_type, tuple) and var_type[0] == 'array':
-                        # array [low..high] → aloca “size” posições
-                        low, high = var_type[1]
-                        size = high - low + 1
-                        self.vm_code.append(f"PUSHI {size}")
-                        self.vm_code.append("ALLOCN")
-                    # Depois, registra na tabela de símbolos:
-                    self.symbol_table.allocate_var(var_name, var_type)
-
-    def translate_program(self, ast):
-        """Translate entire Pascal program AST to VM code."""
-        self.vm_code = []
-
-        # AST: ('program', program_name, code)
-        program_name = ast[1]
-        code_block = ast[2]
-
-        # Se há bloco “code” (declarações + corpo)
-        if code_block[0] == 'code':
-            declarations = code_block[1]
-            self.translate_declarations(declarations)
-
-            # Início do programa na VM
-            self.vm_code.append("START")
-
-            # Cria tradutores de expressão e statement
-            expr_translator = ExpressionTranslator(
-                self.symbol_table,
-                self.vm_code
-            )
-            stmt_translator = StatementTranslator(
-                self.symbol_table,
-                self.vm_code,
-                self.label_gen,
-                expr_translator
-            )
-
-            # Traduz o corpo principal
-            main_body = code_block[2]
-            stmt_translator.translate(main_body)
+        self.short_circuit = short_circuit
+        self.rotate_loops = rotate_loops
+        self.unroll_budget = unroll_budget
+        self.unroll_factor = unroll_factor
+        self.check_bounds = check_bounds
+        self.string_pool = string_pool
+        # Com check_bounds: CHECK emitidos e acessos que a análise dispensou
+        self.checks = 0
+        self.checks_elided = 0
+        self.pooled = 0  # literais no pool de strings
+
+    def translate_declarations(self, declarations, symbols):
+        """Process variable declarations (empurra valor inicial e aloca o Symbol de cada nome)."""
+        for decl in declarations:
+            var_type = decl.type
+
+            initial = INITIAL_VALUES.get(var_type)
+            for var_name in decl.names:
+                if initial:
+                    # inteiros e booleanos a 0, reais a 0.0, strings vazias
+                    self.code.emit(*initial)
+                elif isinstance(var_type, ArrayType):
+                    # array [low..high] → aloca “size” posições
+                    self.code.emit(Op.PUSHI, var_type.size)
+                    self.code.emit(Op.ALLOCN)
+                # Depois, dá-lhe o seu slot global
+                self.symbol_table.allocate(symbols[var_name])
+
+    def translate_for_bounds(self, body, loops):
+        """Hidden globals for the for bounds evaluated once (one per nesting level)."""
+        for level in range(1, bound_slots_needed(body, loops) + 1):
+            self.code.emit(Op.PUSHI, 0)
+            self.symbol_table.allocate(Symbol(for_bound_slot(level), 'integer'))
+
+    def translate_string_pool(self, body):
+        """Hidden globals holding the pooled string literals (see pooled_strings);
+        returns the pool, literal -> address."""
+        pool = {}
+        for n, value in enumerate(pooled_strings(body), 1):
+            self.code.emit(Op.PUSHS, value)
+            pool[value] = self.symbol_table.allocate(Symbol(f"#str{n}", 'string'))
+        return pool
+
+    def translate_program(self, ast, symbols=None):
+        """Translate entire Pascal program AST (a pascal_ast.Program) to lines of VM code."""
+        return self.emit_program(ast, symbols).render()
+
+    def emit_program(self, ast, symbols=None):
+        """Translate entire Pascal program AST (a pascal_ast.Program) to an ir.Code.
+
+        symbols is the name -> Symbol map of an AST already annotated
+        (CompilerSession.parse); without it the AST is annotated here. The
+        addresses of the Symbols are those of the last translation.
+        """
+        self.code = Code()
+        code_block = ast.block
+
+        if symbols is None:
+            # Símbolos dos nomes e tipos das expressões, uma só passagem pela árvore
+            symbols = annotate_types(ast).symbols
+        else:
+            # Os slots são desta tradução: de uma anterior com os mesmos Symbols,
+            # allocate devolveria endereços velhos sem avançar o contador
+            for symbol in symbols.values():
+                symbol.address = None
+                symbol.layout = None
+        # O que escreve o corpo de cada ciclo, calculado uma só vez de baixo para cima
+        loops = analyze_loops(ast)
+        if self.check_bounds:
+            # Índices que a análise de intervalos prova estarem dentro dos limites
+            analyze_ranges(ast, loops)
+
+        # Declarações + corpo
+        self.translate_declarations(code_block.declarations, symbols)
+        self.translate_for_bounds(code_block.body, loops)
+        pool = self.translate_string_pool(code_block.body) if self.string_pool else {}
+        self.pooled = len(pool)
+
+        # Início do programa na VM
+        self.code.emit(Op.START)
+
+        # Cria tradutores de expressão e statement
+        expr_translator = ExpressionTranslator(
+            self.symbol_table,
+            self.code,
+            self.check_bounds
+        )
+        expr_translator.string_pool = pool
+        stmt_translator = StatementTranslator(
+            self.symbol_table,
+            self.code,
+            self.label_gen,
+            expr_translator,
+            self.short_circuit,
+            self.rotate_loops,
+            self.unroll_budget,
+            self.unroll_factor
+        )
+        stmt_translator.loops = loops
+
+        # Traduz o corpo principal
+        trampoline.run(stmt_translator.translate(code_block.body))
 
         # Fim do programa na VM
-        self.vm_code.append("STOP")
-        return self.vm_code
+        self.code.emit(Op.STOP)
+        self.checks = expr_translator.checks
+        self.checks_elided = expr_translator.checks_elided
+        return self.code